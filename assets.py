@@ -0,0 +1,124 @@
+"""
+assets.py
+"""
+
+# -------------------------------------- --------------------------------------
+# System imports
+import collections
+import time
+
+# 3rd party imports
+import pygame
+
+# Component imports
+import cache as CACHE
+import log as LOG
+
+
+# -------------------------------------- --------------------------------------
+class AssetManager(object):
+    # Loads images without stalling frames. Files are decoded on a thread pool; the
+    # convert()/convert_alpha() step, which has to happen on the main thread, runs
+    # in pump() a few surfaces at a time so no single frame pays for all of them.
+    # Finished surfaces live in an LRU capped by bytes.
+    #
+    # _____Notable things_____
+    # - manifests{ key: [path or (path, alpha)] }
+    #    what each display key needs. preload(key) starts all of it loading, so
+    #    the display is ready before it is switched to.
+    #
+    # - get(path) never blocks and returns None until the surface is ready.
+    #    load(path) blocks if it has to.
+    def __init__(self, max_bytes=32 * 1024 * 1024, workers=2, budget=2.0,
+                 manifests=None):
+        self.cache = CACHE.SurfaceCache(max_bytes)
+        self.workers = workers
+        self.pool = None
+        self.budget = budget
+        self.manifests = dict(manifests or {})
+        self.pending = {}
+        self.decoded = collections.deque()
+
+    def register_manifest(self, key, paths):
+        self.manifests[key] = list(paths)
+
+    def preload(self, key):
+        for entry in self.manifests.get(key, []):
+            self.request(*entry_args(entry))
+
+    def ready(self, key):
+        for entry in self.manifests.get(key, []):
+            if entry_args(entry)[0] not in self.cache:
+                return False
+        return True
+
+    def request(self, path, alpha=False):
+        # Starts decoding path in the background unless it's cached or on its way.
+        if path in self.cache or path in self.pending:
+            return
+        if self.pool is None:
+            import concurrent.futures
+            self.pool = concurrent.futures.ThreadPoolExecutor(self.workers)
+        future = self.pool.submit(pygame.image.load, path)
+        self.pending[path] = (future, alpha)
+        future.add_done_callback(lambda future: self.decoded.append(path))
+
+    def get(self, path, alpha=False):
+        surface = self.cache.get(path)
+        if surface is None:
+            self.request(path, alpha)
+        return surface
+
+    def load(self, path, alpha=False):
+        surface = self.cache.get(path)
+        if surface is None:
+            self.request(path, alpha)
+            surface = self.finish(path)
+        return surface
+
+    def pump(self, budget=None):
+        # Converts decoded surfaces for up to budget milliseconds, at least one per
+        # call. Runs once per frame on the main thread.
+        budget = self.budget if budget is None else budget
+        end = time.perf_counter() + budget / 1000.0
+        while self.decoded:
+            self.finish(self.decoded.popleft())
+            if time.perf_counter() >= end:
+                break
+
+    def finish(self, path):
+        if path not in self.pending:
+            return self.cache.get(path)
+        future, alpha = self.pending.pop(path)
+        try:
+            surface = future.result()
+        except (pygame.error, IOError) as error:
+            LOG.error("could not load %s: %s", path, error)
+            return None
+        return self.cache.put(path, convert(surface, alpha))
+
+    def busy(self):
+        # True while anything is still loading or waiting to be finished.
+        return bool(self.pending)
+
+    def shutdown(self):
+        if self.pool:
+            self.pool.shutdown(wait=False)
+
+
+def entry_args(entry):
+    if isinstance(entry, tuple):
+        return entry
+    return (entry, False)
+
+
+def convert(surface, alpha):
+    # Matches the surface to the window's pixel format so blits are fast. With no
+    # window (headless) there is nothing to match.
+    if pygame.display.get_surface() is None:
+        return surface
+    if alpha:
+        return surface.convert_alpha()
+    return surface.convert()
+
+# -------------------------------------- --------------------------------------
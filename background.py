@@ -0,0 +1,164 @@
+"""
+background.py
+"""
+
+# -------------------------------------- --------------------------------------
+# 3rd party imports
+import numpy
+import pygame
+
+# Component imports
+import log as LOG
+import state as STATE
+
+
+# Noise keyframes by (size, scale, keyframes, seed). They only depend on those, so
+# every Background() that asks for the same noise skips working it out again. Each
+# one still takes its own copies, since set_palette() changes the surface.
+KEYFRAMES = {}
+
+
+# -------------------------------------- --------------------------------------
+class Background(object):
+    # A procedural background, built with NumPy and blitted as one 8-bit surface.
+    #
+    # _____Notable things_____
+    # - Every kind is an array of palette indexes, worked out once with NumPy and
+    #    copied into an 8-bit surface with surfarray. Colors come from lut, a 256
+    #    entry palette made from the color stops, so drawing is a single blit.
+    #
+    # - kind
+    #    'gradient' runs top to bottom through the colors.
+    #    'cycle' is the same gradient, with the palette rotating by speed every step.
+    #    'noise' is smooth value noise, looping through keyframes cached surfaces.
+    #
+    # - step() moves the animation on one tick and returns True if it changed, so
+    #    World() only repaints when something actually moved. A still background is
+    #    converted to the screen format once and costs what a fill() does.
+    def __init__(self, size, kind='gradient', colors=('teal', 'lite_green'),
+                 speed=0, scale=8, keyframes=16, hold=4, seed=0):
+        self.size = tuple(size)
+        self.kind = kind
+        self.speed = speed
+        self.hold = max(1, hold)
+        self.tick = 0
+        self.offset = 0
+        self.current = 0
+        self.lut = palette(colors)
+        self.palettes = {}
+
+        if kind == 'noise':
+            self.frames = [frame.copy()
+                           for frame in noise_frames(self.size, scale, keyframes, seed)]
+        elif kind in ('gradient', 'cycle'):
+            self.frames = [indexed(gradient(self.size))]
+        else:
+            LOG.error("Background() has no kind '%s'", kind)
+            self.frames = [indexed(gradient(self.size))]
+        if kind == 'gradient':
+            self.speed = 0
+
+        self.animated = bool(self.speed) or len(self.frames) > 1
+        self.image = None
+        self.set_image()
+
+    def set_image(self):
+        image = self.frames[self.current]
+        image.set_palette(self.get_palette(self.offset))
+        if not self.animated and pygame.display.get_surface():
+            image = image.convert()
+        self.image = image
+
+    def get_palette(self, offset):
+        # The lut rotated by offset, as the list set_palette() wants. Each rotation
+        # is only worked out once.
+        colors = self.palettes.get(offset)
+        if colors is None:
+            colors = numpy.roll(self.lut, -offset, axis=0).tolist()
+            self.palettes[offset] = colors
+        return colors
+
+    def step(self):
+        if not self.animated:
+            return False
+        self.tick += 1
+        changed = False
+        if self.speed:
+            self.offset = (self.offset + self.speed) % 256
+            changed = True
+        if len(self.frames) > 1 and self.tick % self.hold == 0:
+            self.current = (self.current + 1) % len(self.frames)
+            changed = True
+        if changed:
+            self.set_image()
+        return changed
+
+    def draw(self, surface, pos=(0, 0)):
+        surface.blit(self.image, pos)
+
+
+# -------------------------------------- --------------------------------------
+def palette(colors, length=256):
+    # A (length, 3) uint8 lut running through colors (names from STATE.COLORS or
+    # rgb tuples) and back to the first one, so a rotating palette never jumps.
+    stops = []
+    for color in colors:
+        if color in STATE.COLORS:
+            color = STATE.COLORS[color]
+        stops.append(color[:3])
+    stops.append(stops[0])
+    stops = numpy.array(stops, dtype=numpy.float32)
+
+    points = numpy.linspace(0, len(stops) - 1, length, endpoint=False)
+    lut = numpy.empty((length, 3), dtype=numpy.float32)
+    for channel in range(3):
+        lut[:, channel] = numpy.interp(points, numpy.arange(len(stops)), stops[:, channel])
+    return lut.astype(numpy.uint8)
+
+def gradient(size):
+    # Palette indexes running 0-255 from the top of size to the bottom.
+    ramp = numpy.linspace(0, 255, size[1]).astype(numpy.uint8)
+    return numpy.broadcast_to(ramp, size)
+
+def noise(size, grid):
+    # Bilinear, smoothstepped upsampling of a small random grid to size.
+    width, height = grid.shape
+    x = numpy.linspace(0, width - 1, size[0])
+    y = numpy.linspace(0, height - 1, size[1])
+    x0 = numpy.minimum(x.astype(numpy.intp), width - 2)
+    y0 = numpy.minimum(y.astype(numpy.intp), height - 2)
+    fx = x - x0
+    fy = y - y0
+    fx = (fx * fx * (3 - 2 * fx))[:, None]
+    fy = (fy * fy * (3 - 2 * fy))[None, :]
+
+    top = grid[x0][:, y0] * (1 - fx) + grid[x0 + 1][:, y0] * fx
+    bottom = grid[x0][:, y0 + 1] * (1 - fx) + grid[x0 + 1][:, y0 + 1] * fx
+    return top * (1 - fy) + bottom * fy
+
+def noise_frames(size, scale=8, keyframes=16, seed=0):
+    # keyframes 8-bit surfaces of noise, blending from one random grid to another
+    # and back so the last frame leads straight into the first.
+    key = (size, scale, keyframes, seed)
+    if key in KEYFRAMES:
+        return KEYFRAMES[key]
+
+    rng = numpy.random.default_rng(seed)
+    cells = (max(2, size[0] // scale + 1), max(2, size[1] // scale + 1))
+    first = noise(size, rng.random(cells))
+    second = noise(size, rng.random(cells))
+
+    frames = []
+    for n in range(max(1, keyframes)):
+        weight = (1 - numpy.cos(2 * numpy.pi * n / max(1, keyframes))) / 2
+        values = first * (1 - weight) + second * weight
+        frames.append(indexed((values * 255).astype(numpy.uint8)))
+
+    KEYFRAMES[key] = frames
+    return frames
+
+def indexed(indexes):
+    # An 8-bit surface holding the given (width, height) array of palette indexes.
+    surface = pygame.Surface(indexes.shape, 0, 8)
+    pygame.surfarray.blit_array(surface, indexes)
+    return surface
@@ -0,0 +1,188 @@
+"""
+battle.py
+"""
+
+# -------------------------------------- --------------------------------------
+# 3rd party imports
+import pygame
+
+# Component imports
+import group as GROUP
+import state as STATE
+import text as TEXT
+
+
+# The parts of a battle, in order.
+INTRO = 'intro'
+MENU = 'menu'
+EXIT = 'exit'
+
+OPTIONS = ('Fight', 'Item', 'Skill', 'Run')
+
+
+# -------------------------------------- --------------------------------------
+class Battle(object):
+    # What happens in one battle. Control() makes a new one for every battle and
+    # moves it on with state_continue() as the player answers; Scene() shows it.
+    #
+    # _____Notable things_____
+    # - phase
+    #    INTRO, then MENU until an option is accepted, then EXIT until that is
+    #    accepted too. After that completed is True and Control() goes back to the
+    #    World().
+    #
+    # - message is the line Scene() shows for the current phase.
+    def __init__(self, options=OPTIONS):
+        self.options = options
+        self.phase = INTRO
+        self.choice = None
+        self.completed = False
+        self.message = 'Something jumps out at you!'
+
+    @property
+    def in_intro(self):
+        return self.phase == INTRO
+
+    @property
+    def in_menu(self):
+        return self.phase == MENU
+
+    @property
+    def in_exit(self):
+        return self.phase == EXIT
+
+    def state_continue(self, answer, choice=None):
+        # Moves the battle on. answer is 'accept' or 'decline', choice is the menu
+        # option the cursor is on.
+        if self.in_intro:
+            self.phase = MENU
+            self.message = 'What will you do?'
+
+        elif self.in_menu:
+            if answer == 'accept' and choice is not None:
+                self.choice = choice
+                self.phase = EXIT
+                if choice == 'Run':
+                    self.message = 'You got away.'
+                else:
+                    self.message = 'You used %s. It ran off.' % choice
+
+        elif self.in_exit:
+            if answer == 'accept':
+                self.completed = True
+
+
+# -------------------------------------- --------------------------------------
+class Menu(object):
+    # The battle menu: options laid out in a grid with a cursor on one of them.
+    # Every option has a Label() in its Scene(), and moving the cursor only swaps
+    # the images of the two Label()s involved, from surfaces rendered beforehand.
+    def __init__(self, scene, options, columns, origin, cell):
+        self.scene = scene
+        self.options = options
+        self.columns = columns
+        self.index = 0
+        self.labels = []
+        self.normal = []
+        self.highlighted = []
+
+        for x in range(0, len(options)):
+            pos = (origin[0] + (x % columns) * cell[0],
+                   origin[1] + (x // columns) * cell[1])
+            self.normal.append(scene.atlas.render(options[x]))
+            self.highlighted.append(scene.highlight.render('> ' + options[x]))
+            self.labels.append(scene.add_label(options[x], pos))
+
+    @property
+    def selected(self):
+        return self.options[self.index]
+
+    def select(self, index):
+        self.labels[self.index].set_image(self.normal[self.index])
+        self.index = index
+        self.labels[self.index].set_image(self.highlighted[self.index])
+
+    def move_cursor(self, direction):
+        index = self.index
+        if direction == 'left' and index % self.columns:
+            index -= 1
+        elif direction == 'right' and index % self.columns < self.columns - 1:
+            index += 1
+        elif direction == 'up':
+            index -= self.columns
+        elif direction == 'down':
+            index += self.columns
+
+        if 0 <= index < len(self.options) and index != self.index:
+            self.select(index)
+
+
+# -------------------------------------- --------------------------------------
+class Scene(GROUP.Group):
+    # The 'battle' display. It covers the whole screen, so while it is shown the
+    # World() under it is never drawn, only kept (cached) for when it comes back.
+    #
+    # _____Notable things_____
+    # - Everything the scene needs is built by prepare(), one step per call, so
+    #    Display().prewarm() can spread the work over frames before a battle ever
+    #    starts. start() finishes whatever is left if the battle comes first.
+    #
+    # - start(battle) only points the scene at a new Battle() and resets the
+    #    menu, so switching to a prepared scene costs nothing.
+    def __init__(self, key, state, name, size):
+        GROUP.Group.__init__(self, key, state, name)
+        self.opaque = True
+        self.size = size
+        self.battle = None
+        self.menu = None
+        self.message = None
+        self.steps = self.build()
+
+    def build(self):
+        # The steps prepare() works through.
+        panel = pygame.Surface(self.size)
+        panel.fill(self.state.fill_color or (0, 0, 0))
+        pygame.draw.rect(panel, STATE.COLORS['teal'][:3], panel.get_rect(), 2)
+        self.add(GROUP.Item(panel, (0, 0), -1))
+        yield
+
+        self.atlas = TEXT.get_atlas(16, (240, 240, 240))
+        yield
+        self.highlight = TEXT.get_atlas(16, STATE.COLORS['teal'][:3])
+        yield
+
+        self.message = self.add_label('', (8, 8))
+        cell = (self.size[0] // 2 - 8, self.atlas.height + 8)
+        origin = (8, self.size[1] - cell[1] * 2 - 8)
+        self.menu = Menu(self, OPTIONS, 2, origin, cell)
+        yield
+
+    def add_label(self, text, pos):
+        label = TEXT.Label(self.atlas, text, pos)
+        self.add(label)
+        return label
+
+    def prepare(self):
+        # Does the next bit of building. Returns True while there is more to do.
+        if self.steps is None:
+            return False
+        for step in self.steps:
+            return True
+        self.steps = None
+        return False
+
+    def finish(self):
+        while self.prepare():
+            pass
+
+    def start(self, battle):
+        self.finish()
+        self.battle = battle
+        self.menu.select(0)
+        self.refresh()
+
+    def refresh(self):
+        # Shows whatever the Battle() has to say now.
+        self.message.set_text(self.battle.message)
+        for label in self.menu.labels:
+            label.set_visible(self.battle.in_menu)
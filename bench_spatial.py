@@ -0,0 +1,92 @@
+"""
+bench_spatial.py
+
+How point, rect and radius queries scale with the number of objects, through a
+spatial.Grid() against testing every rect. Objects are 8-24 pixel rects spread
+over a 4096x4096 world, the same density the World() and its entities would see.
+
+    python bench_spatial.py [queries]
+"""
+
+# -------------------------------------- --------------------------------------
+# System imports
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+# 3rd party imports
+import pygame
+
+# Component imports
+import spatial as SPATIAL
+
+WORLD = 4096
+COUNTS = (100, 1000, 10000, 100000)
+
+
+# -------------------------------------- --------------------------------------
+def build(count, rng):
+    rects = []
+    for x in range(0, count):
+        size = rng.randint(8, 24)
+        rects.append(pygame.Rect(rng.randrange(WORLD - size), rng.randrange(WORLD - size),
+                                 size, size))
+    grid = SPATIAL.Grid(32)
+    for x in range(0, count):
+        grid.insert(x, rects[x])
+    return rects, grid
+
+
+def linear_radius(rects, center, radius):
+    x, y = center
+    limit = radius * radius
+    found = []
+    for index in range(0, len(rects)):
+        rect = rects[index]
+        dx = max(rect.left - x, 0, x - rect.right)
+        dy = max(rect.top - y, 0, y - rect.bottom)
+        if dx * dx + dy * dy <= limit:
+            found.append(index)
+    return found
+
+
+def per_query(function, args):
+    # Microseconds per call over every set of args.
+    start = time.perf_counter()
+    for arg in args:
+        function(*arg)
+    return (time.perf_counter() - start) * 1000000.0 / len(args)
+
+
+def main():
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = random.Random(1)
+    points = [((rng.randrange(WORLD), rng.randrange(WORLD)),) for x in range(queries)]
+    areas = [(pygame.Rect(rng.randrange(WORLD - 64), rng.randrange(WORLD - 64), 64, 64),)
+             for x in range(queries)]
+    circles = [((rng.randrange(WORLD), rng.randrange(WORLD)), 32) for x in range(queries)]
+
+    print("| microseconds per query, grid vs. testing every rect |")
+    print("|  objects |  point grid / all |   rect grid / all | radius grid / all |")
+    for count in COUNTS:
+        rects, grid = build(count, rng)
+        # Linear scans get slow past 10000 objects, so they run fewer queries.
+        few = max(1, queries * 1000 // count)
+        row = [
+            per_query(grid.query_point, points),
+            per_query(lambda pos: pygame.Rect(pos, (1, 1)).collidelistall(rects),
+                      points[:few]),
+            per_query(grid.query_rect, areas),
+            per_query(lambda area: area.collidelistall(rects), areas[:few]),
+            per_query(grid.query_radius, circles),
+            per_query(lambda center, radius: linear_radius(rects, center, radius),
+                      circles[:few]),
+            ]
+        print("| %8d | %7.2f / %7.1f | %7.2f / %7.1f | %7.2f / %7.1f |" % (
+            (count,) + tuple(row)))
+
+if __name__ == '__main__':
+    main()
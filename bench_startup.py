@@ -0,0 +1,62 @@
+"""
+bench_startup.py
+
+Time from process start to the first frame pushed to the window, over several
+cold starts. Uses SDL's dummy video driver unless --window is given.
+
+    python bench_startup.py [runs] [--window]
+"""
+
+# -------------------------------------- --------------------------------------
+# System imports
+import os
+import subprocess
+import sys
+import time
+
+# The child stops the clock on the first pygame.display.update()/flip() call.
+CHILD = """
+import os, sys, time
+import pygame
+
+def first_frame(*args):
+    sys.stdout.write('%f\\n' % (time.time() - float(sys.argv[1])))
+    sys.stdout.flush()
+    os._exit(0)
+
+pygame.display.update = first_frame
+pygame.display.flip = first_frame
+
+import control
+CONTROL = control.Control({'state': 'world', 'debug': None})
+CONTROL.main_loop()
+"""
+
+
+# -------------------------------------- --------------------------------------
+def run_once(env):
+    start = time.time()
+    output = subprocess.check_output(
+        [sys.executable, '-c', CHILD, repr(start)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env
+        )
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    runs = int(args[0]) if args else 10
+    env = dict(os.environ)
+    env['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+    if '--window' not in sys.argv:
+        env['SDL_VIDEODRIVER'] = 'dummy'
+
+    times = sorted(run_once(env) * 1000.0 for x in range(runs))
+    print("| startup to first frame over %d runs |" % runs)
+    print("| min %.1f ms | median %.1f ms | max %.1f ms |" % (
+        times[0], times[len(times) // 2], times[-1]))
+
+if __name__ == '__main__':
+    main()
+
+# -------------------------------------- --------------------------------------
@@ -0,0 +1,63 @@
+"""
+cache.py
+"""
+
+# -------------------------------------- --------------------------------------
+# System imports
+import collections
+
+
+# -------------------------------------- --------------------------------------
+class SurfaceCache(object):
+    # Least recently used cache of pygame surfaces, capped by how many bytes of
+    # pixels it holds rather than by how many surfaces.
+    #
+    # _____Notable things_____
+    # - get() counts as a use and moves the entry to the back of the line. When a
+    #    put() goes over max_bytes, entries are dropped from the front.
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        surface = self.entries.pop(key, None)
+        if surface is None:
+            self.misses += 1
+            return default
+        self.entries[key] = surface
+        self.hits += 1
+        return surface
+
+    def put(self, key, surface):
+        self.discard(key)
+        self.entries[key] = surface
+        self.bytes += surface_bytes(surface)
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            old_key, old = self.entries.popitem(last=False)
+            self.bytes -= surface_bytes(old)
+        return surface
+
+    def discard(self, key):
+        surface = self.entries.pop(key, None)
+        if surface is not None:
+            self.bytes -= surface_bytes(surface)
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+
+def surface_bytes(surface):
+    width, height = surface.get_size()
+    return width * height * surface.get_bytesize()
+
+# -------------------------------------- --------------------------------------
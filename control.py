@@ -4,16 +4,20 @@ control.py
 
 # -------------------------------------- --------------------------------------
 # System imports
-import math
-import random
 import sys
 
 # 3rd party imports
 import pygame
-from pygame.locals import *
+from pygame.locals import (
+    QUIT, VIDEOEXPOSE, KEYDOWN, KEYUP, MOUSEMOTION, MOUSEBUTTONDOWN, MOUSEBUTTONUP,
+    NOEVENT
+    )
 
 # Local imports
 import display
+import encounter
+import log
+import timestep
 
 
 # -------------------------------------- --------------------------------------
@@ -23,17 +27,41 @@ class Control(object):
     # _____Notable things_____
     # - self.state is a State() object... If self.state.input=False then all
     #     inputs will be overriden. This is the same for 'main' State().
+    #
+    # - Simulation runs in fixed ticks of 1/tick_rate seconds (self.timestep),
+    #     rendering runs once per loop capped at Display.fps. The two rates are
+    #     independent so lowering fps does not change gameplay speed.
+    #
+    # - In headless mode time is simulated: every frame is exactly one tick, frames
+    #     are never presented and nothing waits, so the game runs as fast as the
+    #     CPU allows. max_frames stops the loop after that many frames.
+    #
+    # - 'record' writes every handled event and each frame's tick count to a log,
+    #     'replay' plays one back instead of reading the real event queue.
+    #
+    # - When nothing moves, animates or needs repainting the loop goes idle: it
+    #     sleeps in pygame.event.wait() until an event comes in (or idle_timeout
+    #     ms pass) instead of spinning through empty frames. 0 turns this off.
+    #
+    # - Debug output and errors go through log.py, written out by a background
+    #     thread, so debugging never makes a frame wait on the terminal.
+    #
+    # - With 'sim_process' the World() simulation runs in a worker process (see
+    #     simproc.py) and this loop only handles input and rendering.
     def __init__(self, settings):
+        self.settings = settings
         self.debug = settings['debug']
         self.temp_state = settings['state']
+        if settings.get('log_path', None):
+            log.set_output(settings['log_path'])
         
         if self.debug:
-            self.display = display.Display(setup=True)
+            self.display = display.Display(setup=True, settings=settings)
             #self.display = display.Display(setup=False)
             self.setup()
             
         elif not self.debug:
-            self.display = display.Display(setup=True)
+            self.display = display.Display(setup=True, settings=settings)
             self.setup()
 
     def setup(self):
@@ -43,23 +71,87 @@ class Control(object):
         self.state = self.display.states['control']
         self.state.current = self.temp_state
         self.battle = False
+        self.battle_obj = None
+        self.prewarm = self.settings.get('battle_prewarm', True)
         self.menu = False
         self.world = True
         self.on = True
         self.moving = 0
         self.update_settings = False
         self.non_input_states = {}
-        self.set_engage_chance()
+        self.elapsed = 0
+        self.frame = 0
+        self.idle_timeout = self.settings.get('idle_timeout', 1000)
+        self.idle_frames = 0
+        self.woken = None
+        self.max_frames = self.settings.get('max_frames', None)
+        self.timestep = timestep.FixedStep(
+            self.settings.get('tick_rate', 30), self.settings.get('max_ticks', 5)
+            )
+        self.encounter = encounter.Encounter(
+            self.settings.get('battle_chance_mod', encounter.MOD),
+            self.settings.get('battle_chance_max', encounter.CHANCE_MAX),
+            self.settings.get('seed', None)
+            )
         self.setup_inputs()
+        self.setup_replay()
+        self.setup_sim_process()
+        self.setup_profiler()
+
+    def setup_sim_process(self):
+        # Recording and replaying need the ticks to line up with frames, so they
+        # always simulate in this process.
+        self.sim = None
+        if self.recorder or self.replayer:
+            return
+        if self.settings.get('sim_process', False):
+            import simproc
+            self.sim = simproc.SimProcess(
+                self.display.player.store, self.timestep.tick_rate,
+                self.encounter.base_mod, self.encounter.chance_max,
+                self.settings.get('seed', None)
+                )
+            self.sim.start()
+
+    def setup_replay(self):
+        # Random encounters are always seeded when recording, so a replay of the
+        # log rolls exactly the same battles.
+        self.recorder = None
+        self.replayer = None
+        if self.settings.get('replay') or self.settings.get('record'):
+            import replay
+
+        if self.settings.get('replay'):
+            self.replayer = replay.Replayer(self.settings['replay'])
+            if self.replayer.seed is not None:
+                self.encounter.seed(self.replayer.seed)
+
+        elif self.settings.get('record'):
+            seed = self.settings.get('seed', None)
+            if seed is None:
+                import random
+                seed = random.SystemRandom().getrandbits(62)
+                self.encounter.seed(seed)
+            self.recorder = replay.Recorder(self.settings['record'], seed)
+
+    def setup_profiler(self):
+        # When profiling, the per frame steps are swapped for timed versions of
+        # themselves. Nothing changes when it is off.
+        profiler = self.display.profiler
+        if profiler:
+            self.handle_events = profiler.wrap('events', self.handle_events)
+            self.simulate = profiler.wrap('simulate', self.simulate)
+            self.present = profiler.wrap('flip', self.present)
+            self.wait = profiler.wrap('tick', self.wait)
         
     def setup_inputs(self):
-        self.left = 0
-        self.right = 1
+        self.left = 1
+        self.right = 3
         self.qwer_color_mod = [
             ( 10, -10, -12),
             ( 00, -12,  10),
             (-20,  00,   3),
-            ( -3,  20,  03)
+            ( -3,  20,   3)
             ]
         self.directions = {
             'up': (0, -1), 'down': (0, 1),
@@ -73,7 +165,7 @@ class Control(object):
             }
         self.input_states = {
             'world': self.display.displays['world'].state,
-            'battle': 'not implemented yet'
+            'battle': self.display.states['battle']
             }
         for key in self.display.displays:
             if key not in self.input_states:
@@ -98,6 +190,61 @@ class Control(object):
             pygame.K_ESCAPE: 'ESC'
             }
         self.input_keys = [self.pg_dir_keys, self.pg_qwer_keys, self.pg_esc_keys]
+        self.setup_handlers()
+        self.setup_event_filter()
+
+    def setup_handlers(self):
+        # The event dispatch tables, built once. Every entry maps an event signature,
+        # (event.type, event.key) or (event.type, None) for events without a key, to
+        # a (method, args) pair that is called as method(event, *args).
+        #
+        # global_handlers run in every state. handlers[state] only run when that
+        # state is current and input is allowed.
+        self.global_handlers = {
+            (QUIT, None): (self.quit, ()),
+            (VIDEOEXPOSE, None): (self.redraw, ()),
+            (MOUSEBUTTONUP, None): (self.check_left_click, ())
+            }
+        for key in self.pg_esc_keys:
+            self.global_handlers[(KEYUP, key)] = (self.quit, ())
+
+        world = {}
+        for key in self.pg_dir_keys:
+            direction = self.pg_dir_keys[key]
+            world[(KEYDOWN, key)] = (self.update_direction, (direction, True))
+            world[(KEYUP, key)] = (self.update_direction, (direction, False))
+        for key in self.pg_qwer_keys:
+            if key in self.qwer_states:
+                continue
+            btn_name = self.pg_qwer_keys[key]
+            btn_num = self.pg_qwer_keys[btn_name]
+            world[(KEYUP, key)] = (self.update_qwer, (btn_name, btn_num))
+
+        battle = {}
+        for key in self.pg_dir_keys:
+            battle[(KEYUP, key)] = (self.move_cursor, (self.pg_dir_keys[key],))
+        battle[(KEYUP, pygame.K_q)] = (self.battle_continue, ('accept',))
+        battle[(KEYUP, pygame.K_e)] = (self.show_state, ())
+        battle[(KEYUP, pygame.K_r)] = (self.battle_continue, ('decline',))
+
+        self.handlers = {
+            'world': world,
+            'battle': battle
+            }
+
+    def setup_event_filter(self):
+        # Only event types that something handles are let onto the SDL queue, the
+        # rest (mouse motion above all) are dropped by SDL before Python sees them.
+        # debug='high' needs the mouse events debug_event() prints.
+        types = set()
+        for table in [self.global_handlers] + list(self.handlers.values()):
+            for signature in table:
+                types.add(signature[0])
+        if self.debug == 'high':
+            types.update([MOUSEMOTION, MOUSEBUTTONDOWN])
+
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(sorted(types))
 
     def main_loop(self):
         
@@ -106,28 +253,129 @@ class Control(object):
             self.evaluate_state()
             self.handle_events()
 
-            # In the overworld we need to check to see if a battle needs to happen
-            # we need to apply movement updates to the Player()
-            if self.world:
-                if self.state.input and self.moving:
-                    self.world_movement()
-                    if self.state.moving:
-                        self.random_engage()                
-
-            # Check if the battle is over every frame.
-            if self.battle:
-                self.check_battle_over()
+            # Catch the simulation up with real time. This can be zero ticks on a
+            # fast frame or several on a slow one.
+            # A replay runs exactly the ticks the recording did.
+            if self.sim:
+                self.simulate_remote()
+            else:
+                ticks = self.timestep.advance(self.frame_time())
+                if self.replayer:
+                    ticks = self.replayer.ticks(self.frame)
+                for tick in range(ticks):
+                    self.simulate()
+                if self.recorder:
+                    self.recorder.end_frame(self.frame, ticks)
+
+            # Let Display() do it's thang. Only the rects it reports as changed get
+            # pushed to the window; nothing is pushed on an idle frame.
+            rects = self.display.update()
+            self.elapsed = self.wait()
+            self.display.adapt(self.display.fps_clock.get_rawtime())
+            self.present(rects)
+
+            if self.display.profiler:
+                self.display.profiler.end_frame()
+            log.end_frame()
+            self.frame += 1
+            if self.frame == 1 and self.prewarm:
+                # The first frame is out, the battle scene builds behind the next ones.
+                self.display.prewarm('battle')
+            if self.frame == self.max_frames:
+                self.on = False
+            if self.replayer and self.frame == len(self.replayer):
+                self.on = False
 
-            # Let Display() do it's thang
-            self.display.update()
-            self.display.fps_clock.tick(self.display.fps)
-            pygame.display.update()
+            if self.on and self.can_idle():
+                self.idle()
 
         # Goodbye.
+        if self.display.profiler:
+            self.display.profiler.export()
+        if self.recorder:
+            self.recorder.close()
+        if self.sim:
+            self.sim.stop()
+        self.display.assets.shutdown()
+        log.close()
         while not self.on:
             pygame.quit()
             sys.exit()
 
+    def can_idle(self):
+        # Headless runs and replays have no real input to wait for.
+        if not self.idle_timeout or self.display.headless or self.replayer:
+            return False
+        if self.moving or self.battle:
+            return False
+        return self.display.idle()
+
+    def idle(self):
+        # Sleeps until an event arrives. The event is handed to the next frame's
+        # handle_events(), and the time spent asleep is dropped so the simulation
+        # doesn't try to catch up on it.
+        event = pygame.event.wait(self.idle_timeout)
+        if event.type != NOEVENT:
+            self.woken = event
+        self.display.fps_clock.tick()
+        self.timestep.reset()
+        self.idle_frames += 1
+
+    def frame_time(self):
+        # Milliseconds of game time that passed since the last frame. Headless runs
+        # advance exactly one tick per frame no matter how long the frame took.
+        if self.display.headless:
+            return self.timestep.step
+        return self.elapsed
+
+    def wait(self):
+        # Sleeps off whatever is left of this frame under the fps cap and returns
+        # the milliseconds since the last call.
+        return self.display.fps_clock.tick(self.display.fps)
+
+    def present(self, rects):
+        self.display.present(rects)
+
+    def simulate(self):
+        # One fixed simulation tick.
+        # In the overworld we need to check to see if a battle needs to happen
+        # we need to apply movement updates to the Player()
+        if self.world:
+            if self.moving and self.verify_input():
+                self.world_movement()
+                if self.state.moving:
+                    self.random_engage()
+            else:
+                self.state.moving = False
+                self.display.player.move((0, 0))
+            self.display.player.step(self.timestep.step / 1000.0)
+            self.display.displays['world'].follow(self.display.player.center())
+            self.display.displays['world'].update()
+
+        # Check if the battle is over every tick.
+        if self.battle:
+            self.check_battle_over()
+
+    def simulate_remote(self):
+        # The worker process does the ticks. Here we only pass it this frame's input
+        # and pick up its newest snapshot.
+        direction = (0, 0)
+        engage = False
+        if self.world and self.moving and self.verify_input():
+            direction = self.direction_vector()
+            engage = direction != (0, 0)
+        self.state.moving = engage
+        self.sim.send(direction, engage)
+
+        if self.sim.sync(self.display.player):
+            self.display.displays['world'].follow(self.display.player.center())
+            self.display.displays['world'].update()
+        if self.world and self.sim.take_encounter():
+            self.start_battle()
+
+        if self.battle:
+            self.check_battle_over()
+
     # State functions  
     def evaluate_state(self):
         # All of the state logic for transferring between major states should happen in
@@ -139,53 +387,65 @@ class Control(object):
             self.state.current = 'world'
 
     def check_left_click(self, event):
-        if event.type == pygame.MOUSEBUTTONUP and event.button == self.left:
-            event_x = event.pos[0]
-            event_y = event.pos[1]
+        # Finds what was clicked. Clicking a battle menu option picks it, the same
+        # as moving the cursor there and pressing Q.
+        if event.button != self.left:
+            return
+        key, found = self.display.pick(self.display.to_render(event.pos))
+        if key == 'battle' and self.battle_obj and self.battle_obj.in_menu:
+            menu = self.display.displays['battle'].menu
+            if found in menu.labels and self.verify_input():
+                menu.select(menu.labels.index(found))
+                self.battle_continue(event, 'accept')
+        elif key and self.debug:
+            log.write('debug', "clicked %s on %s", found, key)
+
+    def quit(self, event):
+        self.on = False
+
+    def redraw(self, event):
+        # The window was uncovered, so what is on it can't be trusted anymore.
+        self.display.invalidate()
 
-    def check_quit(self, event):
-        if event.type == KEYUP:
-            if event.key in self.pg_esc_keys:
-                self.on = False
-            
     def handle_events(self):
-        for event in pygame.event.get():
-            self.check_left_click(event)
-            self.check_quit(event)
-            
+        # Input permission only changes between frames, so it is checked once for
+        # the whole batch of events instead of once per event.
+        events = self.get_events()
+        if not events:
+            return
+
+        inputs = None
+        if self.state.current in self.input_states and self.verify_input():
+            inputs = self.handlers[self.state.current]
+
+        for event in events:
             if self.debug:
-                self.debug_event(event)          
-            if self.state.current in self.input_states:
-                self.handle_inputs(event)
+                self.debug_event(event)
 
-    def verify_input(self):
-        # We determine if input is allowed by adding 1 to allowed each time a State()
-        # has input=True. If allowed is 1 or more then input is allowed. If either
-        # Display.state.input or Control.state.input is False then we override all of the
-        # others.
-        allowed = 0
-        
-        for x in range(0, len(self.display.displays)):
-            # This can give KeyError because there are inactive displays that are setup but
-            # dont exist.
-            try:
-                # To avoid an error, we need to set component here... No idea why? [BUG]
-                component = self.display.displays[self.display.display_keys[x]]
-                if component.state.input:
-                    allowed += 1
-                elif not component.state.input:
-                    if component.name == 'main' or component.name == 'control':
-                        allowed = -30
-            except KeyError:
-                allowed += 0
-
-        # We have all the information, we tell the master Control() whether to allow inputs.
-        if allowed >= 1:
-            self.state.input = True
+            self.handle_inputs(event, self.global_handlers)
+            if inputs:
+                self.handle_inputs(event, inputs)
+
+    def get_events(self):
+        # This frame's events, out of the replay log if there is one.
+        if self.replayer:
+            pygame.event.pump()
+            events = self.replayer.events(self.frame)
         else:
-            self.state.input = False
+            events = pygame.event.get()
+            if self.woken:
+                events.insert(0, self.woken)
+                self.woken = None
 
-        return self.state.input
+        if self.recorder:
+            self.recorder.record(self.frame, events)
+        return events
+
+    def verify_input(self):
+        # Input is allowed if any constructed display's State() allows it, unless
+        # 'main' or 'control' has input=False, which overrides all of the others.
+        # Display().inputs keeps that answer current as the flags change.
+        return self.display.inputs.allowed
 
     def update_direction(self, event, direction, being_pressed):
         if being_pressed:
@@ -200,82 +460,31 @@ class Control(object):
     def update_qwer(self, event, name, num_id):
         self.world_color(name, num_id)
 
-    def handle_inputs(self, event):
-        if self.verify_input():
-            #This decides whether or not a Player() is trying to move in a certain direction.
-            # Movement is handled by polling in the World()."""
-            if self.state.current == 'world':
-                
-                # Keys are being pressed
-                if event.type == KEYDOWN:
-                    being_pressed = True
-                    if event.key in self.pg_dir_keys:
-                        for key in self.pg_dir_keys:
-                            if key == event.key:
-                                direction = self.pg_dir_keys[key]
-                                self.update_direction(event, direction, being_pressed)
-
-                # Keys need antidepressants
-                elif event.type == KEYUP:
-                    being_pressed = False
-                    if event.key in self.pg_dir_keys:
-                        for key in self.pg_dir_keys:
-                            if key == event.key:
-                                direction = self.pg_dir_keys[key]
-                                self.update_direction(event, direction, being_pressed)
-
-                    # Non-directional key depresses
-                    if event.key in self.pg_qwer_keys:
-                        for key in self.pg_qwer_keys:
-                            if key == event.key:
-                                btn_name = self.pg_qwer_keys[key]
-                                btn_num  = self.pg_qwer_keys[self.pg_qwer_keys[key]]
-                                self.update_qwer(event, btn_name, btn_num)
-
-                #
-                #
-                #
-                # CONTROL SNIPPET GOES HERE!!!
-                #
-                #
-                #
+    def handle_inputs(self, event, handlers):
+        # Looks the event up in a dispatch table and calls whatever is bound to it.
+        entry = handlers.get((event.type, getattr(event, 'key', None)))
+        if entry:
+            method, args = entry
+            method(event, *args)
 
-            
     # World() Player() movements
     def world_movement(self):
-        # If the button was pressed it will add 1. total is the sum of directions.
-        total = (self.direction_states['left'] + self.direction_states['right'] +
-                 self.direction_states['up'] + self.direction_states['down'])
-
-
-        # We want to override movement if there are 3 directional inputs
-        # We allow movement with 2 directions but we slow the movement. This should be done
-        # using vectors... For now just reducing the speed with the multi True/False flag.
-        if total >= 3:
-            override = True
-        if total == 2:
-            override = False
-            multi = True
-        if total == 1:
-            override = False
-            multi = False
-        if total == 0:
-            override = True
-            multi = False
-
-        if override:
-            self.no_inputs = True
-            pass
-        if not override:
-            self.no_inputs = False
-            for key in self.direction_states:
-                self.move_player(key, self.directions[key], multi)
-
-    def move_player(self, key, direction, multi):
-        # If the direction_state is pressed, move the player in that direction, accounting
-        # for multi-directional (diagonal) movement with the multi flag.
-        if self.direction_states[key]:
-            self.display.player.move(direction, multi)
+        x, y = self.direction_vector()
+        self.no_inputs = (x == 0 and y == 0)
+        self.state.moving = not self.no_inputs
+        self.display.player.move((x, y))
+
+    def direction_vector(self):
+        # The pressed directions are summed into one vector for the Player(). Opposite
+        # keys cancel out and the entity step normalizes the length, so diagonals
+        # move at the same speed as straight lines.
+        x = 0
+        y = 0
+        for key in self.direction_states:
+            if self.direction_states[key]:
+                x += self.directions[key][0]
+                y += self.directions[key][1]
+        return x, y
 
     def world_color(self, btn_name, btn_num):
         for x in range(0, 2):
@@ -283,53 +492,74 @@ class Control(object):
 
     # World() engagement functionality
     def start_battle(self):
+        # The scene is normally prewarmed by now, so this only points it at a new
+        # Battle() and shows it. The World() stays as it is underneath.
+        import battle
         self.world = False
         self.battle = True
+        self.release_directions()
+        self.display.player.move((0, 0))
+        if self.sim:
+            # The worker stops moving and rolling right away, not next frame.
+            self.sim.send((0, 0), False)
+        self.battle_obj = battle.Battle()
+        self.display.prewarm('battle')
+        scene = self.display.displays['battle']
+        scene.start(self.battle_obj)
+        scene.state.show = True
         self.evaluate_state()
-        #self.display.battle()
-        #self.battle_obj = battle.Battle(self.display.player, random=True)
 
     def check_battle_over(self):
         if self.battle_obj.completed:
             self.battle = False
             self.world = True
             self.state.current = 'world'
-            #self.display.battle.state.show = False
-            #self.display.battle.state.clear = True 
-            #self.display.world.state.show = True
-        
-    def random_engage(self):
-        # Decide whether or not an engage should occur based on Player movement.
-        self.battle_chance_mod = random.randint(0, self.battle_chance_mod)
-        self.battle_chance += self.battle_chance_mod
-        roll = random.randint(0, self.battle_chance_max)
+            self.battle_obj = None
+            self.display.displays['battle'].state.show = False
+            if self.sim:
+                # Anything the worker rolled while the battle was starting is stale.
+                self.sim.take_encounter()
+
+    def battle_continue(self, event, answer):
+        scene = self.display.displays['battle']
+        self.battle_obj.state_continue(answer, scene.menu.selected)
+        scene.refresh()
+
+    def move_cursor(self, event, direction):
+        if self.battle_obj.in_menu:
+            self.display.displays['battle'].menu.move_cursor(direction)
+
+    def show_state(self, event):
+        self.message(self.state.current)
+
+    def release_directions(self):
+        # Held direction keys are let go of, their KEYUPs go to the battle menu.
+        for key in self.direction_states:
+            self.direction_states[key] = False
+        self.moving = 0
+        self.state.moving = False
 
-        if self.battle_chance >= roll:
-            self.set_engage_chance()
+    def random_engage(self):
+        # Decide whether or not an engage should occur based on Player movement. The
+        # odds live in self.encounter, see encounter.py for the rules and the batch
+        # simulator that shares them.
+        if self.encounter.step():
             self.start_battle()
 
     def set_engage_chance(self, chance=None, mod=None, chance_max=None):
-        if not chance:
-            self.battle_chance = 0
-        if not mod:
-            self.battle_chance_mod = 4
-        if not chance_max:
-            self.battle_chance_max = 100
-        else:
-            self.battle_chance = chance
-            self.battle_chance_mod = mod
-            self.battle_chance_max = chance_max
+        self.encounter.reset(chance or 0, mod, chance_max)
 
     # Miscellaneous functions
     def debug_event(self, event):
-        # If debugging for the mouse (or any other type of event) is needed, we print out
+        # If debugging for the mouse (or any other type of event) is needed, we log
         # the information here. Other types of events should be added here if they are in need
-        # of debugging in an effort to keep the program clean.
+        # of debugging in an effort to keep the program clean. Mouse motion is one
+        # line per frame, however many events there were.
         if self.debug == 'high':
             if   event.type == pygame.MOUSEMOTION: 
-                print("| debug=high | mouse at (%d, %d) |" % (event.pos))
+                log.coalesce('mouse', 'debug=high', "mouse at (%d, %d)", *event.pos)
             elif event.type == pygame.MOUSEBUTTONDOWN and event.button == self.left:
-                print("| debug=high | STARTED TO LEFT CLICK |")
+                log.write('debug=high', "STARTED TO LEFT CLICK")
 
     def message(self, text):
         self.display.send_msg(text)
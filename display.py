@@ -4,18 +4,20 @@ display.py
 
 # -------------------------------------- --------------------------------------
 # System imports
-import math
-import random
-import sys
-import random
+import importlib
+import os
+import threading
 
 # 3rd party imports
 import pygame
-from pygame.locals import *
 
-# Component imports
+# Component imports. Modules only some displays need are imported when those
+# displays are constructed, see construct_display() and warm_up().
+import assets as ASSETS
+import log as LOG
 import state as STATE
 import world as WORLD
+import schedule as SCHEDULE
 import template as TEMPLATE
 
 
@@ -36,111 +38,270 @@ class Display(object):
     # - display_keys[list]
     #    just key names
     #
-    # - Instantiated by Control() with Display(setup=True)
-    def __init__(self, setup=False):
+    # - Instantiated by Control() with Display(setup=True, settings=settings)
+    #
+    # - dirty_rects (setting, default True)
+    #    only the parts of the screen that displays report as changed are
+    #    repainted and handed to pygame.display.update(). Idle frames repaint
+    #    nothing.
+    #
+    # - window_size / render_size (settings, default 300x300 / window_size)
+    #    every display draws to self.surface, which is render_size. If that is
+    #    not the window size it is scaled to the window in one pass per changed
+    #    frame, with scale_filter 'nearest' or 'smooth'. adaptive_filter drops
+    #    from smooth to nearest while frames run over budget.
+    #
+    # - headless (setting, default False)
+    #    no window is opened. SDL runs on its dummy video driver and everything
+    #    draws to an offscreen surface that is never presented. fps doesn't
+    #    apply; headless_fps caps it instead, and by default nothing does.
+    #
+    # - profile (setting, default False)
+    #    self.profiler times every clear and draw per display key, see
+    #    profiler.Profiler. profile_overlay shows the numbers on screen.
+    #
+    # - assets
+    #    the AssetManager() every display loads images through. Each display's
+    #    manifest is preloaded as soon as it is constructed, and preload(key)
+    #    can start one early for a display that is about to be switched to.
+    #
+    # - Display types
+    #    what each key builds, how it draws and how often it updates all come
+    #    from TYPES, filled in with register_display(). self.scheduler runs the
+    #    updates, spread out over frames.
+    #
+    # - Startup order: background imports start first (warm_up()), then the
+    #    window opens and gets its first frame as soon as the World() is up. Only
+    #    after that are the other default displays built.
+    def __init__(self, setup=False, settings=None):
         self.key = 'main'
+        self.settings = settings or {}
         self.reset_settings()
-        self.setup_states()
+        self.warm_up()
         self.setup_pygame()
+        self.setup_states()
         if setup:
             self.setup_displays()
 
+    def warm_up(self):
+        # Imports what the displays built after the first frame will need, on a
+        # background thread while the main thread opens the window.
+        modules = ['entity']
+        if self.settings.get('world_map', None):
+            modules.append('tilemap')
+        thread = threading.Thread(target=import_modules, args=(modules,))
+        thread.daemon = True
+        thread.start()
+
     def setup_states(self):
         self.display_keys = STATE.DISPLAYS
         self.state = STATE.State(self.key, self)
         self.displays = {}
-        self.states = {}
+        self.inputs = STATE.InputPermission()
+
+        # A State() object for every display that can possibly be created is made
+        # the first time something asks for it. Some of these will never be.
+        self.states = STATE.StateTable(self)
         self.states['main'] = self.state
-        self.state.show = True
-        self.state.clear = False
-        self.state.input = True
-        
-        #Create a State() object for every display that can possibly be created.
-        # Some of these will remain inactive forever or a lot of the time.
-        for x in range(1, len(self.display_keys)):
-            self.states[self.display_keys[x]] = STATE.State(self.display_keys[x], self)
-            
+
     def setup_pygame(self):
-        self.surface = pygame.display.set_mode(self.window_size)
-        pygame.display.init()
-        pygame.font.init()
+        if self.headless:
+            # The dummy driver still gives us the event queue and timers, so the
+            # rest of the program can't tell the difference.
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            pygame.display.init()
+            self.window = None
+            self.surface = pygame.Surface(self.render_size)
+        else:
+            pygame.display.init()
+            self.window = pygame.display.set_mode(self.window_size)
+            if self.scaled:
+                self.surface = pygame.Surface(self.render_size).convert()
+            else:
+                self.surface = self.window
         self.fps_clock = pygame.time.Clock()
+        self.assets = ASSETS.AssetManager(
+            self.settings.get('asset_cache_bytes', 32 * 1024 * 1024),
+            manifests=self.settings.get('asset_manifests', None)
+            )
         
     def setup_displays(self):
+        # The first frame goes out as soon as the World() is there to fill it.
         for x in range(0, self.default_displays_amount):
             self.construct_display(self.display_keys[x])
+            if self.display_keys[x] == STATE.WORLD:
+                self.present(self.update())
+
+        if self.profiler and self.settings.get('profile_overlay', False):
+            self.construct_display('profiler')
+
+        # Everything any display might need starts loading in the background.
+        for key in self.assets.manifests:
+            self.preload(key)
+
+    def preload(self, key):
+        # Starts loading everything the display needs in the background.
+        self.assets.preload(key)
 
     def construct_display(self, key):
-        # Main doesn't really do anything but just clear the screen before anything
-        # else gets displayed.
-        if key == 'main':
-            new_display = TEMPLATE.Template(key, self.states[key], 'main')
-
-        # Control doesn't do anything yet either. The only reason it's included here
-        # is so that it can have a State() object and can override inputs if needed.
-        elif key == 'control':
-            new_display = TEMPLATE.Template(key, self.states[key], 'control')
-
-        # World just fills the screen with a color so the Player() has somewhere to
-        # walk around.
-        elif key == 'world':
-            new_display = WORLD.World(key, self.states[key])
-
-        # Example of a nothing display... Will be useful later.
-        elif key == 'empty':
-            new_display = TEMPLATE.Template(key, self.states[key], 'empty')
-
-        # Not implemented yet.
-        """
-        elif key == 'text':
-            text_type = 'normal'
-            new_display = TEXT.Text(
-                key, self.states[key], text_type, self.text_objects_amount
-                )
-            self.text_objects_amount += 1
-            
-        elif key == 'player':
-            new_display = PLAYER.Player(key, self.states[key])
-        """
-        
+        # Builds the display registered under key (see register_display() below),
+        # and schedules its update if it has one.
+        kind = TYPES.get(key)
+        if kind is None:
+            LOG.error("No display type registered for '%s'", key)
+            return
+        new_display = kind.build(self, key)
+        if kind.update:
+            self.scheduler.add(key, getattr(new_display, kind.update), kind.every)
+
+        self.preload(key)
+
         # Now we make a reference to the newly made display object.
         self.displays[key] = new_display
         self.displays[key].state = self.states[key]
+        self.inputs.register(self.states[key])
+        self.states[key].subscribe(self.state_changed)
+        self.render_list = None
+        if self.states[key].show:
+            self.invalidate()
+
+    def prewarm(self, key):
+        # Gets a display ready before it is needed: it is built (hidden, if its
+        # State() starts hidden), its assets start loading, and whatever it has to
+        # prepare() runs a step per frame. Does nothing for a display that is
+        # already built.
+        if key in self.displays:
+            return
+        self.construct_display(key)
+        display = self.displays[key]
+        name = 'prewarm:%s' % key
+
+        def step():
+            if not display.prepare():
+                self.scheduler.remove(name)
+
+        self.scheduler.add(name, step, 1)
 
     # These deal with updating the screens and ensuring state is handled properly.
     def update(self):
         # This is where all of the displaying occurs. This runs once per frame.
-        # First, clear the display with try_clear(), then start showing the displays
-        # in order.
-        for x in range(0, len(self.display_keys)):
-            try:
-                self.try_clear(self.displays[self.display_keys[x]], self.display_keys[x])
-                self.try_show(self.displays[self.display_keys[x]], self.display_keys[x])
-            except KeyError:
-                pass
-
-    def try_clear(self, display, key):               
-        if display.state.clear:
-            self.wipe(custom_color=None)
-
-    def try_show(self, display, key):
-        # If the display state is grouped and returns updates in the form of
-        # a dict, we go through a loop so we can display each object by
-        # itself. This is because the main Display() object only likes to
-        # display objects one at a time.
-        if display.state.show and not display.state.modified:
-            if display.state.grouped:
-                objects = display.get_updated_objects()
-
-                for x in range(0, len(objects)):
-                    surf, rect = objects[x].get_update()
-                    self.show_this(surf, rect)
+        # Returns the list of rects that changed so Control() can hand them to
+        # pygame.display.update(). In dirty rect mode every layer is redrawn once
+        # per changed rect, clipped to it, so untouched pixels are never filled.
+        self.assets.pump()
+        self.scheduler.run()
 
-        # If the display is not in the form of a group, we just display the
-        #'display' (tired of using this word) by itself
-            elif display.state.grouped == False:
-                surf, rect = display.get_update()
-                self.show_this(surf, rect)
+        if not self.dirty_mode:
+            self.draw_layers()
+            return [self.screen_rect]
+
+        rects = self.collect_dirty_rects()
+        for rect in rects:
+            self.surface.set_clip(rect)
+            self.draw_layers()
+        self.surface.set_clip(None)
+
+        return rects
+
+    def draw_layers(self):
+        # Walks the render list in order: wipe the screen if the entry says so, then
+        # draw the display with the strategy picked for it when the list was built.
+        if self.render_list is None:
+            self.build_render_list()
+
+        for key, display, clear, draw in self.render_list:
+            if clear:
+                clear()
+            if draw:
+                draw(display, key)
+
+    def build_render_list(self):
+        # The constructed displays that clear or show, in draw order, starting from
+        # the top most one that hides everything under it: either an opaque display
+        # that is shown, or a display that clears the screen. Nothing below that is
+        # ever drawn. Each entry is (key, display, clear, draw), clear and draw
+        # being None or the function to call. This only runs again after
+        # construct_display() or a State() flag change.
+        layers = []
+        for key in self.display_keys:
+            display = self.displays.get(key)
+            if display is None:
+                continue
+
+            covers = display.state.show and display.opaque
+            if covers or display.state.clear:
+                layers = []
+
+            # A shown opaque display paints over the whole wipe anyway.
+            clear = None
+            if display.state.clear and not covers:
+                clear = self.wipe
+            draw = self.choose_draw(display)
+            if clear or draw:
+                layers.append((key, display, clear, draw))
+
+        if self.profiler:
+            layers = [self.profile_layer(*layer) for layer in layers]
+        self.render_list = layers
+
+    def profile_layer(self, key, display, clear, draw):
+        # Swaps a render list entry's functions for timed versions of themselves.
+        if clear:
+            clear = self.profiler.wrap('clear:%s' % key, clear)
+        if draw:
+            draw = self.profiler.wrap('%s:%s' % (draw.__name__, key), draw)
+        return (key, display, clear, draw)
+
+    def collect_dirty_rects(self):
+        # Asks every display what it changed since the last frame. A display that
+        # reports no rect, or whose State() flags changed, repaints the whole screen.
+        # Hidden displays have nothing on screen to repaint; showing one repaints
+        # everything anyway.
+        rects = []
+        full = self.full_redraw
+        self.full_redraw = False
+
+        for key in self.displays:
+            display = self.displays[key]
+            dirty = display.get_dirty_rects()
+            if not display.state.show:
+                continue
+            for rect in dirty:
+                if rect is None:
+                    full = True
+                else:
+                    rects.append(self.screen_rect.clip(rect))
+
+        if full:
+            return [self.screen_rect.copy()]
+        return merge_rects(rects)
+
+    def idle(self):
+        # True if the screen will look the same until some input arrives: nothing
+        # is dirty, loading, scheduled or animating.
+        if self.full_redraw or self.scheduler.jobs or self.assets.busy():
+            return False
+        for key in self.displays:
+            display = self.displays[key]
+            if display.dirty_rects or display.animating():
+                return False
+        return True
+
+    def invalidate(self):
+        # Forces the next frame to repaint the whole screen.
+        self.full_redraw = True
+
+    def state_changed(self, state, name, value):
+        # Called by a constructed display's State() whenever one of its flags
+        # changes. Anything but input changes what ends up on the screen.
+        if name != 'input':
+            self.full_redraw = True
+            self.render_list = None
+
+    def choose_draw(self, display):
+        # Picks how a display gets drawn, or None if it isn't shown.
+        if not display.state.show:
+            return None
 
         # If the display will show and display method IS modified in some way.
         # To clarify: modified means that the way the object displays is not simply
@@ -150,22 +311,34 @@ class Display(object):
         #
         # ____Examples of modified display methods____
         #   -- World() just fills up the screen with a color. It's basically a back
-        # ground for where the Player() wants to walk. 
+        # ground for where the Player() wants to walk. It is drawn from its cached
+        # surface.
         #
         #   -- 'main' is simply a placeholder and does not display anything at all.
         # It does serve a purpose in that it is shown before anything else and is
         # responsible for 'blacking out' the screen before anything else is put up.
-        elif display.state.show and display.state.modified:
-            self.show_modified(self.displays[key], key)
+        if display.state.modified:
+            if TYPES[display.key].draw is None:
+                return None
+            return self.show_modified
 
-        # Don't do shit. Maybe something will need to go here later.
-        elif display.state.show == False:
-            pass
+        # If the display state is grouped it is a Group() of surf/rect pairs.
+        elif display.state.grouped:
+            return self.show_grouped
+
+        # If the display is not in the form of a group, we just display the
+        #'display' (tired of using this word) by itself
+        return self.show_single
+
+    def show_grouped(self, display, key):
+        # All of a Group()'s surf/rect pairs go out in a single blits() call, and
+        # only the ones that touch the area being repainted are passed along.
+        self.show_these(display.get_blits(self.surface.get_clip()))
+
+    def show_single(self, display, key):
+        surf, rect = display.get_update()
+        self.show_this(surf, rect)
 
-        # You done got errors again, bro.
-        else:
-            print("| E | >> try_show() error. |")
-        
     def wipe(self, custom_color=None):
         # All this does is wipe the screen with black if you have not given this
         # a custom color to fill the screen with. This is how World() displays.
@@ -180,62 +353,234 @@ class Display(object):
     def show_modified(self, display, key):
         # Custom display methods for displays that are not cut and dry. To clarify
         # this: modified displays are displays that do not simply return a surf/rect
-        # pair (or dictionary of pairs) to be displayed to the screen.
-        if key == 'world':
-            self.wipe(self.displays['world'].state.fill_color)
-
-        elif key == 'main':
-            self.wipe()
-
-        elif key == 'control':
-            pass
-
-        elif key == 'text':
-            for x in range(0, len(self.displays['text'])):
-                surface, rect = self.get_update()
-                self.display_this(surface, rect)
-
-        # This is an example of how a display can be treated as a group of individual
-        # sprites with surf/rect pairs.
-        elif key == 'qwer':
-            for key in self.displays['qwer']:
-                self.displays['qwer'][key].handle_state()
-
-            if self.states['qwer'].show:
-                for key in self.displays['qwer']:
-                    surface, rect = self.displays['qwer'].get_update(key)
-                    self.display_this(surface, rect)
-
-        elif key == 'empty':
-            self.displays['world'].state.fill_color[2] += 20 # To show that it's working.
+        # pair (or dictionary of pairs) to be displayed to the screen. How each one
+        # draws is the draw function it was registered with.
+        TYPES[key].draw(self, display)
 
     def show_this(self, surf, rect):
         # Takes a surface and a rectangle and puts on the damn screen. It really
         # just forces it on there and doesn't give a fuck. Only send display objects
         # here if you know you are showing it at the correct time.
         self.surface.blit(surf, rect)
+
+    def show_these(self, blits):
+        # show_this() for a whole sequence of (surf, rect) pairs at once.
+        self.surface.blits(blits, False)
+
+    def present(self, rects):
+        # Pushes the changed parts of the screen to the window. There is no window
+        # to push to when headless. A scaled surface goes out whole, in one pass.
+        if not rects or self.headless:
+            return
+        if self.scaled:
+            if self.scale_filter == 'smooth':
+                pygame.transform.smoothscale(self.surface, self.window_size, self.window)
+            else:
+                pygame.transform.scale(self.surface, self.window_size, self.window)
+            rects = [self.window.get_rect()]
+        pygame.display.update(rects)
+
+    def adapt(self, work):
+        # Given how many milliseconds the last frame spent working, switches to the
+        # nearest filter while frames run over budget and back to smooth once they
+        # are comfortably under it again.
+        if not (self.adaptive_filter and self.scaled and self.fps):
+            return
+        budget = 1000.0 / self.fps
+        self.frame_work = self.frame_work * 0.9 + work * 0.1
+        if self.scale_filter == 'smooth' and self.frame_work > budget * 0.9:
+            self.scale_filter = 'nearest'
+        elif self.scale_filter == 'nearest' and self.frame_work < budget * 0.5:
+            self.scale_filter = 'smooth'
+
+    def pick(self, pos):
+        # (key, what) for the top most shown display with something at pos, in
+        # render surface coordinates, or (None, None). Nothing under an opaque
+        # display can be seen, so the search stops there.
+        if self.render_list is None:
+            self.build_render_list()
+        for key, display, clear, draw in reversed(self.render_list):
+            if not draw:
+                continue
+            found = display.pick(pos)
+            if found is not None:
+                return key, found
+            if display.opaque:
+                break
+        return None, None
+
+    def to_render(self, pos):
+        # Window coordinates (like a mouse position) to render surface coordinates.
+        return (pos[0] * self.render_size[0] // self.window_size[0],
+                pos[1] * self.render_size[1] // self.window_size[1])
     
     # More general and widely used functions.
     def send_msg(self, text):
+        # The text display is only built the first time something is said.
+        if 'text' not in self.displays:
+            self.construct_display('text')
         self.displays['text'].send_msg(text)
 
     def reset_settings(self):
         self.colors = self.get_colors()
         self.refresh_color = self.colors['teal']
-        self.fps = 30
-        self.window_size = (300, 300)
-        
+        self.headless = self.settings.get('headless', False)
+        if self.headless:
+            self.fps = self.settings.get('headless_fps', 0)
+        else:
+            self.fps = self.settings.get('fps', 30)
+        self.window_size = tuple(self.settings.get('window_size', (300, 300)))
+        self.render_size = tuple(self.settings.get('render_size', self.window_size))
+        self.scaled = self.render_size != self.window_size
+        self.scale_filter = self.settings.get('scale_filter', 'nearest')
+        self.adaptive_filter = (self.settings.get('adaptive_filter', False) and
+                                self.scale_filter == 'smooth')
+        self.frame_work = 0.0
+        self.screen_rect = pygame.Rect((0, 0), self.render_size)
+        self.camera = pygame.Rect((0, 0), self.render_size)
+        self.dirty_mode = self.settings.get('dirty_rects', True)
+        self.full_redraw = True
+        self.render_list = None
+        self.scheduler = SCHEDULE.Scheduler()
+        self.profiler = None
+        if self.settings.get('profile', False):
+            import profiler as PROFILER
+            self.profiler = PROFILER.Profiler(
+                self.settings.get('profile_frames', 300),
+                self.settings.get('profile_export', None)
+                )
+
         self.text_objects_amount = 0
-        self.default_displays_amount = 3
+        self.default_displays_amount = 4
 
     def get_colors(self):
-        colors = {
-            'black':      (  0,   0,   0, False),
-            'white':      (240, 240, 240, False),
-            'teal':       (  0, 150, 185, False),
-            'lite_green': (  0, 100, 220, False)
-            }
-
-        return colors
+        return STATE.COLORS
+
+
+# -------------------------------------- --------------------------------------
+def merge_rects(rects):
+    # Unions every group of overlapping rects into one so each pixel is repainted
+    # once per frame and pygame.display.update() gets a short list. Empty rects
+    # (off screen or zero sized) are dropped.
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        if not rect.w or not rect.h:
+            continue
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+
+    return merged
+
+
+def import_modules(names):
+    for name in names:
+        importlib.import_module(name)
+
+
+# -------------------------------------- --------------------------------------
+class DisplayType(object):
+    # Everything Display() needs to know about one kind of display.
+    #
+    # _____Notable things_____
+    # - build(screen, key) returns the new display object. screen is the Display().
+    #
+    # - draw(screen, display) is how a modified display draws itself, None if it
+    #    never draws anything. Grouped and single displays ignore it.
+    #
+    # - update/every
+    #    the name of a method of the display to call every frame (every=1), every
+    #    Nth frame (every=N), or never (every=0, the display only changes when
+    #    something invalidates it).
+    __slots__ = ('build', 'draw', 'update', 'every')
+
+    def __init__(self, build, draw=None, update=None, every=0):
+        self.build = build
+        self.draw = draw
+        self.update = update
+        self.every = every
+
+
+TYPES = {}
+
+def register_display(name, build, draw=None, update=None, every=0):
+    # Adds (or replaces) the display type Display().construct_display(name) builds.
+    TYPES[name] = DisplayType(build, draw, update, every)
+
+
+# Main doesn't really do anything but just clear the screen before anything else
+# gets displayed.
+def build_main(screen, key):
+    return TEMPLATE.Template(key, screen.states[key], 'main')
+
+def draw_main(screen, display):
+    screen.wipe()
+
+# Control doesn't do anything yet either. The only reason it's included here is so
+# that it can have a State() object and can override inputs if needed.
+def build_control(screen, key):
+    return TEMPLATE.Template(key, screen.states[key], 'control')
+
+# World just fills the screen with a color (or a background) so the Player() has
+# somewhere to walk around.
+def build_world(screen, key):
+    return WORLD.World(
+        key, screen.states[key], screen.camera, screen.settings.get('world_map', None),
+        screen.settings.get('world_background', None)
+        )
+
+def draw_world(screen, display):
+    display.draw(screen.surface)
+
+# Example of a nothing display... Will be useful later.
+def build_empty(screen, key):
+    return TEMPLATE.Template(key, screen.states[key], 'empty')
+
+def draw_empty(screen, display):
+    screen.displays['world'].change_color(2, 20) # To show that it's working.
+
+# Frame timings drawn on top of everything else.
+def build_profiler(screen, key):
+    import profiler as PROFILER
+    return PROFILER.Overlay(key, screen.states[key], 'profiler', screen.profiler)
+
+# Labels and messages, drawn from glyph atlases.
+def build_text(screen, key):
+    import text as TEXT
+    text_type = 'normal'
+    new_display = TEXT.Text(
+        key, screen.states[key], text_type, screen.text_objects_amount,
+        screen.render_size
+        )
+    screen.text_objects_amount += 1
+    return new_display
+
+# The Player() and every other entity, moved and drawn from arrays.
+def build_player(screen, key):
+    import entity as ENTITY
+    bounds = screen.render_size
+    if 'world' in screen.displays:
+        bounds = screen.displays['world'].size
+    screen.player = ENTITY.Entities(
+        key, screen.states[key], 'player', bounds, screen.camera
+        )
+    return screen.player
+
+# The battle scene, see battle.py. Control() prewarms it before battles start.
+def build_battle(screen, key):
+    import battle as BATTLE
+    return BATTLE.Scene(key, screen.states[key], 'battle', screen.render_size)
+
+register_display(STATE.MAIN, build_main, draw_main)
+register_display(STATE.CONTROL, build_control)
+register_display(STATE.WORLD, build_world, draw_world)
+register_display(STATE.EMPTY, build_empty, draw_empty)
+register_display(STATE.PROFILER, build_profiler, update='refresh', every=15)
+register_display(STATE.TEXT, build_text)
+register_display(STATE.PLAYER, build_player)
+register_display(STATE.BATTLE, build_battle)
 
 # -------------------------------------- --------------------------------------
@@ -0,0 +1,120 @@
+"""
+encounter.py
+"""
+
+# -------------------------------------- --------------------------------------
+# System imports
+import random
+
+
+# -------------------------------------- --------------------------------------
+# The rules, shared by Encounter() (the live game) and simulate() (offline). Every
+# movement step:
+#
+#   mod     = a random whole number from 0 to mod, so it only ever shrinks
+#   chance += mod
+#   roll    = a random whole number from 0 to chance_max
+#
+# and a battle starts when chance >= roll. After a battle chance and mod go back to
+# their starting values.
+MOD = 4
+CHANCE_MAX = 100
+
+
+# -------------------------------------- --------------------------------------
+class Encounter(object):
+    # The live random encounter odds for one Player(). Seeding it makes a run
+    # reproducible: the same seed and the same steps give the same battles.
+    def __init__(self, mod=MOD, chance_max=CHANCE_MAX, seed=None):
+        self.base_mod = mod
+        self.chance_max = chance_max
+        self.rng = random.Random(seed)
+        self.steps = 0
+        self.reset()
+
+    def seed(self, seed):
+        self.rng.seed(seed)
+
+    def reset(self, chance=0, mod=None, chance_max=None):
+        self.chance = chance
+        self.mod = self.base_mod if mod is None else mod
+        if chance_max is not None:
+            self.chance_max = chance_max
+        self.steps = 0
+
+    def step(self):
+        # One movement step. Returns True if a battle should start.
+        self.steps += 1
+        self.mod = self.rng.randint(0, self.mod)
+        self.chance += self.mod
+        roll = self.rng.randint(0, self.chance_max)
+
+        if self.chance >= roll:
+            self.reset()
+            return True
+        return False
+
+
+# -------------------------------------- --------------------------------------
+def simulate(mods, chance_maxes, trials=10000, max_steps=1000, seed=None):
+    # Plays the encounter rules for every (mod, chance_max) pair trials times at
+    # once with NumPy. Returns an int array shaped (pairs, trials) of the step each
+    # trial's battle started on, or -1 if it didn't within max_steps.
+    import numpy
+    rng = numpy.random.default_rng(seed)
+    mods = numpy.broadcast_to(numpy.asarray(mods)[:, None],
+                              (len(mods), trials))
+    chance_maxes = numpy.broadcast_to(numpy.asarray(chance_maxes)[:, None],
+                                      (len(chance_maxes), trials))
+
+    mod = mods.ravel().astype(numpy.int64)
+    chance_max = chance_maxes.ravel().astype(numpy.int64)
+    chance = numpy.zeros(mod.shape, dtype=numpy.int64)
+    result = numpy.full(mod.shape, -1, dtype=numpy.int64)
+    active = numpy.arange(len(mod))
+
+    for step in range(1, max_steps + 1):
+        # Only trials still walking around are rolled for.
+        mod[active] = rng.integers(0, mod[active] + 1)
+        chance[active] += mod[active]
+        roll = rng.integers(0, chance_max[active] + 1)
+
+        hit = chance[active] >= roll
+        result[active[hit]] = step
+        active = active[~hit]
+        if not len(active):
+            break
+
+    return result.reshape(mods.shape)
+
+
+def summarize(result, points=(50, 90, 99)):
+    # Mean, percentiles and the fraction that never fought, for each row of a
+    # simulate() result.
+    import numpy
+    rows = []
+    for steps in result:
+        fought = steps[steps >= 0]
+        row = {'never': 1.0 - len(fought) / float(len(steps))}
+        if len(fought):
+            row['mean'] = float(fought.mean())
+            for point in points:
+                row['p%d' % point] = float(numpy.percentile(fought, point))
+        rows.append(row)
+    return rows
+
+
+# -------------------------------------- --------------------------------------
+if __name__ == '__main__':
+    # Quick table of steps-to-encounter over a grid of settings.
+    import itertools
+    import sys
+
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    grid = list(itertools.product([1, 2, 4, 8, 16], [50, 100, 200, 400]))
+    result = simulate([g[0] for g in grid], [g[1] for g in grid], trials, seed=0)
+    print("  mod    max    mean     p50     p90     p99  never")
+    for (mod, chance_max), row in zip(grid, summarize(result)):
+        print("%5d %6d %7.1f %7.1f %7.1f %7.1f %6.3f" % (
+            mod, chance_max, row.get('mean', 0), row.get('p50', 0),
+            row.get('p90', 0), row.get('p99', 0), row['never']))
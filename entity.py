@@ -0,0 +1,242 @@
+"""
+entity.py
+"""
+
+# -------------------------------------- --------------------------------------
+# 3rd party imports
+import numpy
+import pygame
+
+# Component imports
+import spatial as SPATIAL
+import template as TEMPLATE
+
+
+# -------------------------------------- --------------------------------------
+class EntityStore(object):
+    # Every moving thing in the World() as rows of NumPy arrays, so one step()
+    # moves all of them at once instead of one Python call per entity.
+    #
+    # _____Notable things_____
+    # - direction is where an entity wants to go, as summed up key presses or AI
+    #    output. Any length works: step() normalizes it, so diagonals are as fast
+    #    as straight lines and opposite directions cancel out.
+    #
+    # - speed is in pixels per second. Positions are clamped to bounds.
+    #
+    # - Arrays grow by doubling. Only the first count rows are live.
+    def __init__(self, bounds, capacity=16):
+        self.bounds = numpy.array(bounds, dtype=float)
+        self.count = 0
+        self.pos = numpy.zeros((capacity, 2))
+        self.previous = numpy.zeros((capacity, 2))
+        self.direction = numpy.zeros((capacity, 2))
+        self.velocity = numpy.zeros((capacity, 2))
+        self.size = numpy.zeros((capacity, 2))
+        self.speed = numpy.zeros(capacity)
+        self.kind = numpy.zeros(capacity, dtype=int)
+
+    def add(self, pos, size, speed, kind=0):
+        if self.count == len(self.pos):
+            self.grow()
+        index = self.count
+        self.pos[index] = pos
+        self.previous[index] = pos
+        self.size[index] = size
+        self.speed[index] = speed
+        self.kind[index] = kind
+        self.count += 1
+        return index
+
+    def grow(self):
+        for name in ('pos', 'previous', 'direction', 'velocity', 'size', 'speed', 'kind'):
+            old = getattr(self, name)
+            new = numpy.zeros((len(old) * 2,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def step(self, dt):
+        # Moves every entity dt seconds along its direction. Returns the indexes
+        # of the entities whose on-screen (whole pixel) position changed.
+        n = self.count
+        pos = self.pos[:n]
+        direction = self.direction[:n]
+        self.previous[:n] = pos
+
+        length = numpy.hypot(direction[:, 0], direction[:, 1])
+        scale = numpy.zeros(n)
+        numpy.divide(self.speed[:n] * dt, length, out=scale, where=length > 0)
+        numpy.multiply(direction, scale[:, None], out=self.velocity[:n])
+
+        pos += self.velocity[:n]
+        numpy.minimum(pos, self.bounds - self.size[:n], out=pos)
+        numpy.maximum(pos, 0, out=pos)
+
+        changed = numpy.floor(pos) != numpy.floor(self.previous[:n])
+        return numpy.flatnonzero(changed[:, 0] | changed[:, 1])
+
+
+# -------------------------------------- --------------------------------------
+class Entities(TEMPLATE.Template):
+    # The 'player' display. Draws everything in its EntityStore() straight from
+    # the arrays, the Player() being entity 0.
+    #
+    # _____Notable things_____
+    # - images[kind] is the surface drawn for every entity of that kind.
+    #
+    # - Positions are in World() pixels. camera (shared with the World()) is
+    #    subtracted to get to the screen.
+    #
+    # - max_dirty: when more entities than this move in one step, the whole
+    #    screen is repainted instead of merging hundreds of small rects.
+    #
+    # - index is a spatial.Grid() of entity rects in World() pixels, by entity
+    #    index, used for the cells only: pick(), near() and touching() get their
+    #    candidates from it and test them against the arrays. Stepping only marks
+    #    it stale. The first query after that works out over the arrays which
+    #    entities crossed into other cells (spans) and moves just those, so a
+    #    tick nobody queries costs nothing extra.
+    PLAYER = 0
+
+    def __init__(self, key, state, name, bounds, camera, max_dirty=64):
+        TEMPLATE.Template.__init__(self, key, state, name)
+        self.store = EntityStore(bounds)
+        self.camera = camera
+        self.max_dirty = max_dirty
+        self.images = {}
+        self.index = SPATIAL.Grid()
+        self.spans = numpy.full((len(self.store.pos), 4), -1, dtype=int)
+        self.stale = False
+
+        player = pygame.Surface((12, 12))
+        player.fill((240, 240, 240))
+        self.images[self.PLAYER] = player
+        center = (bounds[0] / 2.0 - 6, bounds[1] / 2.0 - 6)
+        self.add(center, player.get_size(), 90.0, self.PLAYER)
+
+    def add(self, pos, size, speed, kind=0):
+        index = self.store.add(pos, size, speed, kind)
+        if len(self.spans) < len(self.store.pos):
+            spans = numpy.full((len(self.store.pos), 4), -1, dtype=int)
+            spans[:len(self.spans)] = self.spans
+            self.spans = spans
+        self.stale = True
+        return index
+
+    def move(self, direction, index=PLAYER):
+        self.store.direction[index] = direction
+
+    def step(self, dt):
+        return self.track(self.store.step(dt))
+
+    def animating(self):
+        # Any entity still heading somewhere.
+        return bool(self.store.direction[:self.store.count].any())
+
+    def track(self, moved):
+        # Dirties where the given entities were and where they are now.
+        if len(moved):
+            self.stale = True
+        if len(moved) > self.max_dirty:
+            self.invalidate()
+            return moved
+
+        size = self.store.size
+        offset = self.camera.topleft
+        for index in moved.tolist():
+            self.invalidate(rect_at(self.store.previous[index], size[index], offset))
+            self.invalidate(rect_at(self.store.pos[index], size[index], offset))
+        return moved
+
+    def get_index(self):
+        # The index, with every entity that crossed into other cells since it was
+        # last used moved over.
+        if self.stale:
+            self.stale = False
+            n = self.store.count
+            left, right = self.bounds(slice(0, n))
+            cell = self.index.cell
+            spans = numpy.concatenate((left // cell, (right - 1) // cell), axis=1)
+            changed = numpy.flatnonzero((spans != self.spans[:n]).any(axis=1))
+            self.spans[:n] = spans
+            pos = self.store.pos
+            size = self.store.size
+            for index in changed.tolist():
+                self.index.move(index, rect_at(pos[index], size[index]))
+        return self.index
+
+    def bounds(self, indexes):
+        # Top left and bottom right corners, World() pixels, of the rects rect_at()
+        # gives the entities at indexes.
+        left = self.store.pos[indexes].astype(int)
+        return left, left + self.store.size[indexes].astype(int) + 1
+
+    def candidates(self, rect):
+        # Indexes of the entities in the cells rect touches.
+        grid = self.get_index()
+        found = grid.candidates(grid.span(rect))
+        return numpy.fromiter(found, dtype=numpy.intp, count=len(found))
+
+    def pick(self, pos):
+        # The entity at pos on screen, or None.
+        x = pos[0] + self.camera.x
+        y = pos[1] + self.camera.y
+        found = self.candidates(pygame.Rect(x, y, 1, 1))
+        left, right = self.bounds(found)
+        inside = ((left[:, 0] <= x) & (x < right[:, 0]) &
+                  (left[:, 1] <= y) & (y < right[:, 1]))
+        if inside.any():
+            return int(found[inside].max())
+        return None
+
+    def near(self, index, radius):
+        # Every other entity within radius (World() pixels) of entity index.
+        x, y = self.center(index)
+        area = pygame.Rect(int(x - radius) - 1, int(y - radius) - 1,
+                           int(radius * 2) + 4, int(radius * 2) + 4)
+        found = self.candidates(area)
+        left, right = self.bounds(found)
+        dx = numpy.maximum(numpy.maximum(left[:, 0] - x, x - right[:, 0]), 0)
+        dy = numpy.maximum(numpy.maximum(left[:, 1] - y, y - right[:, 1]), 0)
+        found = found[(dx * dx + dy * dy <= radius * radius) & (found != index)]
+        return found.tolist()
+
+    def touching(self, index):
+        # Every other entity whose rect overlaps entity index's.
+        rect = rect_at(self.store.pos[index], self.store.size[index])
+        found = self.candidates(rect)
+        left, right = self.bounds(found)
+        overlap = ((left[:, 0] < rect.right) & (right[:, 0] > rect.left) &
+                   (left[:, 1] < rect.bottom) & (right[:, 1] > rect.top))
+        return found[overlap & (found != index)].tolist()
+
+    def center(self, index=PLAYER):
+        return self.store.pos[index] + self.store.size[index] / 2.0
+
+    def get_blits(self, area=None):
+        # (image, position) pairs for every entity, or only the ones that overlap
+        # area. The overlap test runs over the arrays, not per entity.
+        store = self.store
+        n = store.count
+        pos = numpy.floor(store.pos[:n]).astype(int) - self.camera.topleft
+        if area is None:
+            indexes = numpy.arange(n)
+        else:
+            x, y, width, height = area
+            size = store.size[:n]
+            inside = ((pos[:, 0] < x + width) & (pos[:, 0] + size[:, 0] > x) &
+                      (pos[:, 1] < y + height) & (pos[:, 1] + size[:, 1] > y))
+            indexes = numpy.flatnonzero(inside)
+
+        images = self.images
+        kinds = store.kind[indexes].tolist()
+        points = pos[indexes].tolist()
+        return [(images[kinds[x]], points[x]) for x in range(0, len(kinds))]
+
+
+def rect_at(pos, size, offset=(0, 0)):
+    # Screen rect of an entity, one pixel bigger to cover where it was rounded.
+    return pygame.Rect(int(pos[0]) - offset[0], int(pos[1]) - offset[1],
+                       int(size[0]) + 1, int(size[1]) + 1)
+
+# -------------------------------------- --------------------------------------
@@ -0,0 +1,132 @@
+"""
+group.py
+"""
+
+# -------------------------------------- --------------------------------------
+# 3rd party imports
+import pygame
+
+# Component imports
+import spatial as SPATIAL
+import template as TEMPLATE
+
+
+# -------------------------------------- --------------------------------------
+class Item(pygame.sprite.Sprite):
+    # One surf/rect pair inside a Group(). Change it through set_image(), move_to()
+    # and set_visible() so the Group() knows what part of the screen to repaint.
+    def __init__(self, image, pos=(0, 0), layer=0):
+        pygame.sprite.Sprite.__init__(self)
+        self._layer = layer
+        self.visible = True
+        self.image = image
+        self.rect = image.get_rect(topleft=pos)
+        self.owner = None
+        self.order = 0
+
+    def set_image(self, image):
+        self.changed()
+        self.image = image
+        self.rect.size = image.get_size()
+        self.changed(rebuild=True)
+        if self.owner:
+            self.owner.index.move(self, self.rect)
+
+    def move_to(self, pos):
+        if self.rect.topleft != tuple(pos):
+            self.changed()
+            self.rect.topleft = pos
+            self.changed()
+            if self.owner:
+                self.owner.index.move(self, self.rect)
+
+    def set_visible(self, visible):
+        if self.visible != visible:
+            self.visible = visible
+            self.changed(rebuild=True)
+
+    def changed(self, rebuild=False):
+        # Marks where this item is right now as needing a repaint.
+        if self.owner:
+            self.owner.invalidate(self.rect.copy())
+            if rebuild:
+                self.owner.blit_list = None
+
+
+# -------------------------------------- --------------------------------------
+class Group(TEMPLATE.Template):
+    # A display made of many Item()s. Display() draws it with one Surface.blits()
+    # call instead of one blit() per item, and only passes along the items that
+    # touch the area being repainted.
+    #
+    # _____Notable things_____
+    # - items is a LayeredUpdates, so draw order follows each Item()'s layer.
+    #
+    # - blit_list/rect_list are the cached (image, rect) pairs in draw order. They
+    #    hold the Item() rects themselves, so moving an item doesn't rebuild them;
+    #    adding, removing, hiding or swapping an image does.
+    #
+    # - index is a spatial.Grid() of the Item() rects, kept current as they move,
+    #    so pick() only tests the items near the point. Of those the top most is
+    #    the one with the highest (layer, order), order counting up as items are
+    #    added, the same as draw order.
+    def __init__(self, key, state, name):
+        TEMPLATE.Template.__init__(self, key, state, name)
+        self.items = pygame.sprite.LayeredUpdates()
+        self.index = SPATIAL.Grid()
+        self.blit_list = None
+        self.rect_list = None
+        self.added = 0
+
+    def add(self, item, layer=None):
+        if layer is not None:
+            item._layer = layer
+        item.owner = self
+        item.order = self.added
+        self.added += 1
+        self.items.add(item)
+        self.index.insert(item, item.rect)
+        self.blit_list = None
+        self.invalidate(item.rect.copy())
+
+    def remove(self, item):
+        if item.owner is self:
+            self.items.remove(item)
+            self.index.remove(item)
+            item.owner = None
+            self.blit_list = None
+            self.invalidate(item.rect.copy())
+
+    def change_layer(self, item, layer):
+        self.items.change_layer(item, layer)
+        # LayeredUpdates puts it last in its new layer, so it counts as added now.
+        item.order = self.added
+        self.added += 1
+        self.blit_list = None
+        self.invalidate(item.rect.copy())
+
+    def pick(self, pos):
+        # The top most visible Item() at pos, or None.
+        hits = [item for item in self.index.query_point(pos) if item.visible]
+        if not hits:
+            return None
+        return max(hits, key=lambda item: (item._layer, item.order))
+
+    def get_blits(self, area=None):
+        # The (image, rect) pairs to hand to Surface.blits(). With an area, only
+        # the items that overlap it.
+        if self.blit_list is None:
+            self.blit_list = []
+            self.rect_list = []
+            for item in self.items.sprites():
+                if item.visible:
+                    self.blit_list.append((item.image, item.rect))
+                    self.rect_list.append(item.rect)
+
+        if area is None:
+            return self.blit_list
+
+        blits = self.blit_list
+        return [blits[x] for x in area.collidelistall(self.rect_list)]
+
+# -------------------------------------- --------------------------------------
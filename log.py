@@ -0,0 +1,159 @@
+"""
+log.py
+"""
+
+# -------------------------------------- --------------------------------------
+# System imports
+import atexit
+import sys
+import threading
+
+
+# -------------------------------------- --------------------------------------
+class Log(object):
+    # Debug and error output that never waits on a terminal or a file. Records go
+    # into a preallocated ring and a background thread writes them out in batches.
+    #
+    # _____Notable things_____
+    # - A record is (level, text, args, count). text % args is only worked out on
+    #    the writer thread, so logging costs the main loop a tuple and a lock.
+    #
+    # - coalesce(key, ...) keeps only the latest record for key until end_frame(),
+    #    counting how many it replaced. A frame of mouse motion is one line.
+    #
+    # - If the writer falls behind by size records the oldest ones are dropped
+    #    and the writer says how many.
+    #
+    # - Output goes to stderr unless set_output(path) names a file.
+    def __init__(self, size=1024, interval=0.2):
+        self.size = size
+        self.interval = interval
+        self.records = [None] * size
+        self.start = 0
+        self.count = 0
+        self.dropped = 0
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stream = sys.stderr
+        self.owned = False
+        self.thread = None
+        self.closing = False
+
+    def set_output(self, path=None):
+        # Where records get written: a file at path, or stderr with no path.
+        self.flush()
+        if self.owned:
+            self.stream.close()
+        if path:
+            self.stream = open(path, 'a')
+            self.owned = True
+        else:
+            self.stream = sys.stderr
+            self.owned = False
+
+    def write(self, level, text, *args):
+        self.add((level, text, args, 1))
+
+    def coalesce(self, key, level, text, *args):
+        # Like write(), but only the last record under key each frame is kept.
+        record = self.pending.get(key)
+        count = record[3] + 1 if record else 1
+        self.pending[key] = (level, text, args, count)
+
+    def end_frame(self):
+        # Moves this frame's coalesced records into the ring.
+        if self.pending:
+            for key in self.pending:
+                self.add(self.pending[key])
+            self.pending = {}
+
+    def add(self, record):
+        with self.lock:
+            if self.count == self.size:
+                self.start = (self.start + 1) % self.size
+                self.count -= 1
+                self.dropped += 1
+            self.records[(self.start + self.count) % self.size] = record
+            self.count += 1
+        if self.thread is None:
+            self.begin()
+
+    def begin(self):
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        atexit.register(self.close)
+
+    def run(self):
+        while not self.closing:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            self.flush()
+
+    def flush(self):
+        # Writes out everything in the ring in one go.
+        with self.lock:
+            records = []
+            for x in range(0, self.count):
+                index = (self.start + x) % self.size
+                records.append(self.records[index])
+                self.records[index] = None
+            dropped = self.dropped
+            self.start = 0
+            self.count = 0
+            self.dropped = 0
+        if not records and not dropped:
+            return
+
+        lines = []
+        if dropped:
+            lines.append('| log | %d records dropped |\n' % dropped)
+        for level, text, args, count in records:
+            if args:
+                text = text % args
+            if count > 1:
+                lines.append('| %s | %s | x%d |\n' % (level, text, count))
+            else:
+                lines.append('| %s | %s |\n' % (level, text))
+        try:
+            self.stream.write(''.join(lines))
+            self.stream.flush()
+        except (IOError, ValueError):
+            pass
+
+    def close(self):
+        # Writes out whatever is left and stops the writer thread.
+        self.end_frame()
+        if self.thread is not None and not self.closing:
+            self.closing = True
+            self.wake.set()
+            self.thread.join()
+        self.flush()
+        if self.owned:
+            self.stream.close()
+            self.stream = sys.stderr
+            self.owned = False
+
+
+# -------------------------------------- --------------------------------------
+# The one Log() everything writes to.
+RING = Log()
+
+def set_output(path=None):
+    RING.set_output(path)
+
+def write(level, text, *args):
+    RING.write(level, text, *args)
+
+def error(text, *args):
+    RING.write('E', text, *args)
+
+def coalesce(key, level, text, *args):
+    RING.coalesce(key, level, text, *args)
+
+def end_frame():
+    RING.end_frame()
+
+def close():
+    RING.close()
@@ -17,7 +17,34 @@ def main():
 
     intialization_settings = {
         'state': 'world',
-        'debug': None
+        'debug': None,
+        'log_path': None,           # Debug output and errors go here, or stderr.
+        'fps': 30,          # Render cap. 0 renders as fast as possible.
+        'window_size': (300, 300),
+        'render_size': (300, 300),  # What displays draw at, scaled to the window.
+        'scale_filter': 'nearest',  # or 'smooth'
+        'adaptive_filter': False,   # Drop smooth to nearest when frames run late.
+        'tick_rate': 30,    # Simulation ticks per second.
+        'max_ticks': 5,     # Most ticks run in one frame before lag is dropped.
+        'headless': False,  # No window, no frame cap, one tick per frame.
+        'headless_fps': 0,  # Frame cap when headless, 0 for none.
+        'max_frames': None, # Quit after this many frames (CI / servers).
+        'profile': False,           # Time every part of every frame.
+        'profile_overlay': False,   # Draw the slowest timings on screen.
+        'profile_export': None,     # Write timings to this .csv/.json on exit.
+        'seed': None,               # Seed for random encounters.
+        'battle_chance_mod': 4,
+        'battle_chance_max': 100,
+        'battle_prewarm': True,     # Build the battle scene a step per frame right
+                                    # after the first frame, so no battle waits for it.
+        'world_map': None,          # Tile map file, see tilemap.create().
+        'world_background': None,   # e.g. {'kind': 'noise', 'speed': 1}, see background.py.
+        'asset_manifests': {},      # display key -> image paths to preload.
+        'asset_cache_bytes': 32 * 1024 * 1024,
+        'record': None,             # Write every input to this log.
+        'replay': None,             # Play this log back instead of real input.
+        'sim_process': False,       # Simulate the World() in a worker process.
+        'idle_timeout': 1000        # ms to sleep waiting for input when idle, 0 never.
         }
     
     CONTROL = control.Control(intialization_settings)
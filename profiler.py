@@ -0,0 +1,167 @@
+"""
+profiler.py
+"""
+
+# -------------------------------------- --------------------------------------
+# System imports
+import array
+import time
+
+# 3rd party imports
+import pygame
+
+# Component imports
+import template as TEMPLATE
+
+
+# -------------------------------------- --------------------------------------
+class Ring(object):
+    # Fixed size buffer of the latest timing samples (milliseconds) for one
+    # section. Old samples are overwritten, nothing is ever allocated after init.
+    __slots__ = ('samples', 'size', 'index', 'count', 'total')
+
+    def __init__(self, size):
+        self.samples = array.array('d', [0.0]) * size
+        self.size = size
+        self.index = 0
+        self.count = 0
+        self.total = 0
+
+    def add(self, value):
+        self.samples[self.index] = value
+        self.index = (self.index + 1) % self.size
+        self.total += 1
+        if self.count < self.size:
+            self.count += 1
+
+    def values(self):
+        return self.samples[:self.count]
+
+    def percentiles(self, points=(50, 95, 99)):
+        values = sorted(self.values())
+        if not values:
+            return [0.0 for point in points]
+        last = len(values) - 1
+        return [values[int(round(point / 100.0 * last))] for point in points]
+
+
+# -------------------------------------- --------------------------------------
+class Profiler(object):
+    # Times parts of every frame and keeps the latest samples of each in a Ring().
+    #
+    # _____Notable things_____
+    # - wrap(name, function) returns a timed version of function. Control() and
+    #    Display() only swap their methods for wrapped ones when profiling is on,
+    #    so a normal run pays nothing.
+    #
+    # - Section names used by Control() and Display():
+    #    events, simulate, flip, tick, frame, clear:<key>, <draw strategy>:<key>
+    def __init__(self, size=300, export=None):
+        self.size = size
+        self.export_path = export
+        self.rings = {}
+        self.frames = 0
+        self.last_frame = time.perf_counter()
+
+    def ring(self, name):
+        if name not in self.rings:
+            self.rings[name] = Ring(self.size)
+        return self.rings[name]
+
+    def wrap(self, name, function):
+        ring = self.ring(name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            ring.add((time.perf_counter() - start) * 1000.0)
+            return result
+
+        return timed
+
+    def end_frame(self):
+        now = time.perf_counter()
+        self.ring('frame').add((now - self.last_frame) * 1000.0)
+        self.last_frame = now
+        self.frames += 1
+
+    def summary(self):
+        # {section: {count, mean, p50, p95, p99, max}} over the samples in the rings.
+        rows = {}
+        for name in self.rings:
+            ring = self.rings[name]
+            values = ring.values()
+            p50, p95, p99 = ring.percentiles()
+            rows[name] = {
+                'count': ring.total,
+                'mean': sum(values) / len(values) if values else 0.0,
+                'p50': p50,
+                'p95': p95,
+                'p99': p99,
+                'max': max(values) if values else 0.0
+                }
+        return rows
+
+    def export(self, path=None):
+        # Writes summary() to path, as CSV if it ends in .csv and JSON otherwise.
+        path = path or self.export_path
+        if not path:
+            return
+
+        import csv
+        import json
+
+        rows = self.summary()
+        columns = ['count', 'mean', 'p50', 'p95', 'p99', 'max']
+        if path.endswith('.csv'):
+            with open(path, 'w') as out:
+                writer = csv.writer(out)
+                writer.writerow(['section'] + columns)
+                for name in sorted(rows):
+                    writer.writerow([name] + [rows[name][column] for column in columns])
+        else:
+            with open(path, 'w') as out:
+                json.dump({'frames': self.frames, 'sections': rows}, out, indent=2,
+                          sort_keys=True)
+
+
+# -------------------------------------- --------------------------------------
+class Overlay(TEMPLATE.Template):
+    # On-screen table of the slowest sections (by p95). Display() calls refresh()
+    # every few frames rather than every frame (see its display type), and only
+    # its own rect is marked dirty when it does.
+    def __init__(self, key, state, name, profiler, lines=8):
+        TEMPLATE.Template.__init__(self, key, state, name)
+        self.profiler = profiler
+        self.lines = lines
+        if not pygame.font.get_init():
+            pygame.font.init()
+        self.font = pygame.font.Font(None, 14)
+        self.image = pygame.Surface((1, 1), pygame.SRCALPHA)
+        self.rect = self.image.get_rect()
+
+    def refresh(self):
+        rows = self.profiler.summary()
+        names = sorted(rows, key=lambda name: rows[name]['p95'], reverse=True)
+        text = ['section          p50   p95   p99']
+        for name in names[:self.lines]:
+            row = rows[name]
+            text.append('%-15s %5.2f %5.2f %5.2f' % (
+                name[:15], row['p50'], row['p95'], row['p99']))
+
+        height = self.font.get_linesize()
+        surfs = [self.font.render(line, True, (240, 240, 240)) for line in text]
+        width = max(surf.get_width() for surf in surfs) + 4
+
+        self.invalidate(self.rect.copy())
+        self.image = pygame.Surface((width, height * len(surfs) + 4), pygame.SRCALPHA)
+        self.image.fill((0, 0, 0, 160))
+        for x in range(0, len(surfs)):
+            self.image.blit(surfs[x], (2, 2 + x * height))
+        self.rect = self.image.get_rect()
+        self.invalidate(self.rect.copy())
+
+    def get_update(self):
+        return self.image, self.rect
+
+# -------------------------------------- --------------------------------------
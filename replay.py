@@ -0,0 +1,100 @@
+"""
+replay.py
+"""
+
+# -------------------------------------- --------------------------------------
+# System imports
+import struct
+
+# 3rd party imports
+import pygame
+
+# A log is a header followed by fixed size records. Each record is one event
+# (frame, type, key or button, mod, x, y) or, with type END_FRAME, the end of a
+# frame and how many simulation ticks ran in it (in the key field).
+HEADER = struct.Struct('<4sHq')
+RECORD = struct.Struct('<IHiHhh')
+MAGIC = b'DLRP'
+VERSION = 1
+END_FRAME = 0xFFFF
+NO_SEED = -1
+
+KEY_EVENTS = (pygame.KEYDOWN, pygame.KEYUP)
+BUTTON_EVENTS = (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP)
+
+
+# -------------------------------------- --------------------------------------
+class Recorder(object):
+    # Writes every event Control() handles, plus how many ticks each frame ran, to
+    # a compact binary log. Writes go through a large buffer so recording costs
+    # next to nothing per frame.
+    def __init__(self, path, seed):
+        self.out = open(path, 'wb', 64 * 1024)
+        self.out.write(HEADER.pack(MAGIC, VERSION, NO_SEED if seed is None else seed))
+
+    def record(self, frame, events):
+        pack = RECORD.pack
+        for event in events:
+            code = 0
+            mod = 0
+            x = y = 0
+            if event.type in KEY_EVENTS:
+                code = event.key
+                mod = event.mod & 0xFFFF
+            elif event.type in BUTTON_EVENTS:
+                code = event.button
+                x, y = event.pos
+            elif event.type == pygame.MOUSEMOTION:
+                x, y = event.pos
+            self.out.write(pack(frame, event.type, code, mod, x, y))
+
+    def end_frame(self, frame, ticks):
+        self.out.write(RECORD.pack(frame, END_FRAME, ticks, 0, 0, 0))
+
+    def close(self):
+        self.out.close()
+
+
+# -------------------------------------- --------------------------------------
+class Replayer(object):
+    # Reads a Recorder() log back. events(frame) rebuilds the pygame events of that
+    # frame and ticks(frame) says how many simulation ticks it ran, which is what
+    # makes a replay land on exactly the same state as the recording.
+    def __init__(self, path):
+        with open(path, 'rb') as source:
+            data = source.read()
+        magic, version, seed = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a replay log" % path)
+
+        self.seed = None if seed == NO_SEED else seed
+        self.frames = {}
+        self.tick_counts = []
+        body = data[HEADER.size:]
+        body = body[:len(body) - len(body) % RECORD.size]
+        for frame, kind, code, mod, x, y in RECORD.iter_unpack(body):
+            if kind == END_FRAME:
+                self.tick_counts.append(code)
+            else:
+                self.frames.setdefault(frame, []).append(rebuild(kind, code, mod, x, y))
+
+    def __len__(self):
+        return len(self.tick_counts)
+
+    def events(self, frame):
+        return self.frames.get(frame, [])
+
+    def ticks(self, frame):
+        return self.tick_counts[frame]
+
+
+def rebuild(kind, code, mod, x, y):
+    if kind in KEY_EVENTS:
+        return pygame.event.Event(kind, key=code, mod=mod, unicode='', scancode=0)
+    elif kind in BUTTON_EVENTS:
+        return pygame.event.Event(kind, button=code, pos=(x, y))
+    elif kind == pygame.MOUSEMOTION:
+        return pygame.event.Event(kind, pos=(x, y), rel=(0, 0), buttons=(0, 0, 0))
+    return pygame.event.Event(kind)
+
+# -------------------------------------- --------------------------------------
@@ -0,0 +1,96 @@
+"""
+schedule.py
+"""
+
+
+# -------------------------------------- --------------------------------------
+class Scheduler(object):
+    # Runs functions every frame or every Nth frame. Display() calls run() once per
+    # frame for the displays that need regular updates.
+    #
+    # _____Notable things_____
+    # - every
+    #    1 runs the function every frame, N every Nth frame. 0 never runs it; the
+    #    display only changes when something invalidates it.
+    #
+    # - Functions that run every Nth frame are given the phase that collides with
+    #    the fewest other jobs, so a handful of every-15-frames layers do not all
+    #    land on the same frame.
+    #
+    # - Jobs wait in due, keyed by the frame they run on next. A frame only touches
+    #    the jobs that are due, so adding slower layers costs the frames they run
+    #    on and nothing else.
+    def __init__(self):
+        self.frame = 0
+        self.running = False
+        self.always = []
+        self.due = {}
+        self.jobs = {}
+
+    def add(self, name, function, every=1):
+        # Schedules function under name, replacing anything already under it.
+        self.remove(name)
+        if every < 1:
+            return
+        if every == 1:
+            self.always.append((name, function))
+            self.jobs[name] = (function, 1, None)
+            return
+
+        # While run() is going this frame's due list is already taken, so the
+        # soonest a new job can run is next frame.
+        frame = self.frame + 1 if self.running else self.frame
+        phase = self.pick_phase(every)
+        start = frame + (phase - frame) % every
+        self.jobs[name] = (function, every, phase)
+        self.due.setdefault(start, []).append(name)
+
+    def remove(self, name):
+        job = self.jobs.pop(name, None)
+        if job is None:
+            return
+        if job[1] == 1:
+            self.always = [entry for entry in self.always if entry[0] != name]
+        else:
+            for names in self.due.values():
+                if name in names:
+                    names.remove(name)
+
+    def pick_phase(self, every):
+        # Two jobs every a and every b frames, at phases p and q, ever run on the same
+        # frame only when p and q match modulo gcd(a, b). The phase with the fewest
+        # such matches wins.
+        loads = [0] * every
+        for function, other, phase in self.jobs.values():
+            if phase is None:
+                continue
+            step = gcd(every, other)
+            for candidate in range(phase % step, every, step):
+                loads[candidate] += 1
+        return loads.index(min(loads))
+
+    def run(self):
+        # Runs everything that is due this frame, then moves on to the next one.
+        self.running = True
+        for name, function in self.always:
+            function()
+
+        names = self.due.pop(self.frame, None)
+        if names:
+            for name in names:
+                job = self.jobs.get(name)
+                if job is None:
+                    continue
+                job[0]()
+                # Unless the job removed or replaced itself while running.
+                if self.jobs.get(name) is job:
+                    self.due.setdefault(self.frame + job[1], []).append(name)
+        self.running = False
+        self.frame += 1
+
+
+# -------------------------------------- --------------------------------------
+def gcd(a, b):
+    while b:
+        a, b = b, a % b
+    return a
@@ -0,0 +1,158 @@
+"""
+simproc.py
+"""
+
+# -------------------------------------- --------------------------------------
+# System imports
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+# 3rd party imports
+import numpy
+
+# Component imports
+import encounter as ENCOUNTER
+import entity as ENTITY
+import timestep as TIMESTEP
+
+# The shared block starts with a header of int64s, followed by two position
+# buffers of (capacity, 2) float64s. The worker fills the back buffer and then
+# bumps SEQ; the front buffer is always SEQ % 2.
+SEQ = 0          # Snapshots published so far.
+STOP = 1         # Main process sets this to end the worker.
+DX = 2           # Player direction, written by the main process.
+DY = 3
+ENGAGE = 4       # 1 while random encounters should be rolled.
+ENCOUNTERS = 5   # Battles the worker has started so far.
+TICKS = 6        # Simulation ticks run so far.
+HEADER_SIZE = 8
+
+
+def layout(buf, capacity):
+    header = numpy.ndarray((HEADER_SIZE,), numpy.int64, buf)
+    size = capacity * 2 * 8
+    buffers = [
+        numpy.ndarray((capacity, 2), numpy.float64, buf, HEADER_SIZE * 8 + x * size)
+        for x in range(2)
+        ]
+    return header, buffers
+
+
+# -------------------------------------- --------------------------------------
+def run(name, bounds, pos, size, speed, kind, tick_rate, mod, chance_max, seed):
+    # The worker process. Steps the entities and rolls encounters on its own fixed
+    # timestep and publishes a snapshot after every batch of ticks that moved an
+    # entity by a whole pixel.
+    shm = shared_memory.SharedMemory(name)
+    header, buffers = layout(shm.buf, len(pos))
+
+    store = ENTITY.EntityStore(bounds, len(pos))
+    for x in range(0, len(pos)):
+        store.add(pos[x], size[x], speed[x], kind[x])
+    engage = ENCOUNTER.Encounter(mod, chance_max, seed)
+    steps = TIMESTEP.FixedStep(tick_rate)
+    dt = steps.step / 1000.0
+
+    last = time.perf_counter()
+    while not header[STOP]:
+        now = time.perf_counter()
+        ticks = steps.advance((now - last) * 1000.0)
+        last = now
+
+        moved = False
+        for tick in range(ticks):
+            store.direction[ENTITY.Entities.PLAYER] = (header[DX], header[DY])
+            if len(store.step(dt)):
+                moved = True
+            if header[ENGAGE] and engage.step():
+                header[ENCOUNTERS] += 1
+            header[TICKS] += 1
+
+        if moved:
+            buffers[(header[SEQ] + 1) % 2][:store.count] = store.pos[:store.count]
+            header[SEQ] += 1
+
+        time.sleep(max(0.0, steps.step / 1000.0 - (time.perf_counter() - now)))
+
+    del header, buffers
+    shm.close()
+
+
+# -------------------------------------- --------------------------------------
+class SimProcess(object):
+    # Runs the World() simulation in its own process so a heavy tick never costs
+    # the main process a frame. The main process only writes input and reads the
+    # newest snapshot, straight out of shared memory.
+    #
+    # _____Notable things_____
+    # - The entities that exist when start() is called are the ones simulated.
+    #
+    # - The worker is spawned, not forked, so it never inherits this process's
+    #    SDL state or threads.
+    #
+    # - sync() points the EntityStore()'s positions at the front buffer instead of
+    #    copying them. A snapshot can be overwritten while it is being drawn if
+    #    the worker publishes twice in one frame; that costs at most one frame of
+    #    mixed positions, never a stall.
+    def __init__(self, store, tick_rate, mod, chance_max, seed=None):
+        self.store = store
+        self.count = store.count
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=HEADER_SIZE * 8 + 2 * self.count * 2 * 8
+            )
+        self.header, self.buffers = layout(self.shm.buf, self.count)
+        self.header[:] = 0
+        for buffer in self.buffers:
+            buffer[:] = store.pos[:self.count]
+        self.seen = 0
+        self.encounters = 0
+        self.process = multiprocessing.get_context('spawn').Process(
+            target=run,
+            args=(self.shm.name, store.bounds.tolist(), store.pos[:self.count].copy(),
+                  store.size[:self.count].copy(), store.speed[:self.count].copy(),
+                  store.kind[:self.count].copy(), tick_rate, mod, chance_max, seed)
+            )
+        self.process.daemon = True
+
+    def start(self):
+        self.process.start()
+
+    def send(self, direction, engage):
+        self.header[DX] = direction[0]
+        self.header[DY] = direction[1]
+        self.header[ENGAGE] = 1 if engage else 0
+
+    def sync(self, entities):
+        # Switches the entities over to the newest snapshot and dirties whatever
+        # moved since the last one. Returns True if there was a new snapshot.
+        seq = self.header[SEQ]
+        if seq == self.seen:
+            return False
+        self.seen = seq
+
+        store = self.store
+        previous = store.previous[:self.count]
+        previous[:] = store.pos[:self.count]
+        store.pos = self.buffers[seq % 2]
+        changed = numpy.floor(store.pos[:self.count]) != numpy.floor(previous)
+        entities.track(numpy.flatnonzero(changed[:, 0] | changed[:, 1]))
+        return True
+
+    def take_encounter(self):
+        # True if the worker started any battles since the last call. Only one
+        # battle can run at a time, so every pending one is used up at once.
+        if self.header[ENCOUNTERS] > self.encounters:
+            self.encounters = int(self.header[ENCOUNTERS])
+            return True
+        return False
+
+    def stop(self):
+        self.header[STOP] = 1
+        self.process.join(1.0)
+        self.store.pos = self.store.pos.copy()
+        del self.header, self.buffers
+        self.shm.close()
+        self.shm.unlink()
+
+# -------------------------------------- --------------------------------------
@@ -0,0 +1,148 @@
+"""
+spatial.py
+"""
+
+# -------------------------------------- --------------------------------------
+# 3rd party imports
+import pygame
+
+
+# -------------------------------------- --------------------------------------
+class Grid(object):
+    # A uniform grid of square cells over rects, for finding what is at a point,
+    # inside a rect or within a radius without looking at everything.
+    #
+    # _____Notable things_____
+    # - Every object is listed in each cell its rect touches. A query only looks
+    #    at the objects in the cells it covers, so its cost depends on how crowded
+    #    that spot is, not on how many objects there are.
+    #
+    # - cell should be about the size of a typical object. Much smaller and big
+    #    objects sit in many cells, much bigger and cells get crowded.
+    #
+    # - move() only touches the cell lists when the object crosses into other
+    #    cells, which for small steps is almost never.
+    #
+    # - Objects are anything hashable: Item()s, entity indexes, display keys.
+    def __init__(self, cell=32):
+        self.cell = cell
+        self.cells = {}
+        self.rects = {}
+        self.spans = {}
+
+    def __len__(self):
+        return len(self.rects)
+
+    def __contains__(self, obj):
+        return obj in self.rects
+
+    def span(self, rect):
+        # (first column, first row, last column, last row) of the cells rect touches.
+        cell = self.cell
+        return (rect.left // cell, rect.top // cell,
+                (rect.left + max(rect.width, 1) - 1) // cell,
+                (rect.top + max(rect.height, 1) - 1) // cell)
+
+    def insert(self, obj, rect):
+        if obj in self.rects:
+            self.move(obj, rect)
+            return
+        rect = pygame.Rect(rect)
+        span = self.span(rect)
+        self.rects[obj] = rect
+        self.spans[obj] = span
+        cells = self.cells
+        for key in cells_in(span):
+            if key in cells:
+                cells[key].add(obj)
+            else:
+                cells[key] = set([obj])
+
+    def move(self, obj, rect):
+        if obj not in self.rects:
+            self.insert(obj, rect)
+            return
+        rect = pygame.Rect(rect)
+        span = self.span(rect)
+        self.rects[obj] = rect
+        old = self.spans[obj]
+        if span != old:
+            self.spans[obj] = span
+            self.unlink(obj, old)
+            cells = self.cells
+            for key in cells_in(span):
+                if key in cells:
+                    cells[key].add(obj)
+                else:
+                    cells[key] = set([obj])
+
+    def remove(self, obj):
+        if obj in self.rects:
+            del self.rects[obj]
+            self.unlink(obj, self.spans.pop(obj))
+
+    def unlink(self, obj, span):
+        cells = self.cells
+        for key in cells_in(span):
+            objs = cells.get(key)
+            if objs:
+                objs.discard(obj)
+                if not objs:
+                    del cells[key]
+
+    def clear(self):
+        self.cells = {}
+        self.rects = {}
+        self.spans = {}
+
+    def candidates(self, span):
+        # Every object in the cells of span, each once.
+        cells = self.cells
+        if span[0] == span[2] and span[1] == span[3]:
+            return cells.get((span[0], span[1]), ())
+        found = set()
+        for key in cells_in(span):
+            objs = cells.get(key)
+            if objs:
+                found.update(objs)
+        return found
+
+    def query_point(self, pos):
+        x, y = int(pos[0]), int(pos[1])
+        objs = self.cells.get((x // self.cell, y // self.cell))
+        if not objs:
+            return []
+        rects = self.rects
+        return [obj for obj in objs if rects[obj].collidepoint(x, y)]
+
+    def query_rect(self, rect):
+        rect = pygame.Rect(rect)
+        rects = self.rects
+        return [obj for obj in self.candidates(self.span(rect))
+                if rects[obj].colliderect(rect)]
+
+    def query_radius(self, center, radius):
+        # Objects whose rect comes within radius of center. The distance runs to
+        # right/bottom, one past the last pixel, so the area searched reaches a
+        # pixel further than span() alone would.
+        x, y = center
+        area = pygame.Rect(int(x - radius) - 1, int(y - radius) - 1,
+                           int(radius * 2) + 4, int(radius * 2) + 4)
+        rects = self.rects
+        limit = radius * radius
+        found = []
+        for obj in self.candidates(self.span(area)):
+            rect = rects[obj]
+            dx = max(rect.left - x, 0, x - rect.right)
+            dy = max(rect.top - y, 0, y - rect.bottom)
+            if dx * dx + dy * dy <= limit:
+                found.append(obj)
+        return found
+
+
+# -------------------------------------- --------------------------------------
+def cells_in(span):
+    left, top, right, bottom = span
+    for column in range(left, right + 1):
+        for row in range(top, bottom + 1):
+            yield (column, row)
@@ -8,8 +8,10 @@ MAIN = 'main'
 CONTROL = 'control'
 WORLD = 'world'
 PLAYER = 'player'
+BATTLE = 'battle'
 TEXT = 'text'
 EMPTY = 'empty'
+PROFILER = 'profiler'
 
 # Global list of displays.
 DISPLAYS = [
@@ -17,71 +19,195 @@ DISPLAYS = [
     CONTROL,
     WORLD,
     PLAYER,
+    BATTLE,
     TEXT,
-    EMPTY
+    EMPTY,
+    PROFILER
     ]
 
+# Displays that block all input when their State().input is False.
+INPUT_OVERRIDES = [
+    MAIN,
+    CONTROL
+    ]
+
+# The one color table. Every State() and Display() share it, nobody copies it.
+COLORS = {
+    'black':      (  0,   0,   0, False),
+    'white':      (240, 240, 240, False),
+    'teal':       (  0, 150, 185, False),
+    'lite_green': (  0, 100, 220, False)
+    }
+
+# State() flags, packed into a single int per State().
+SHOW     = 1
+CLEAR    = 2
+INPUT    = 4
+GROUPED  = 8
+MODIFIED = 16
+
+
+# -------------------------------------- --------------------------------------
+class Profile(object):
+    # The defaults a State() starts with, looked up by display name in PROFILES.
+    # fill_color is a key into COLORS, extra holds any other attributes to set.
+    __slots__ = ('flags', 'fill_color', 'extra')
+
+    def __init__(self, flags, fill_color=None, extra=None):
+        self.flags = flags
+        self.fill_color = fill_color
+        self.extra = extra or {}
+
+
+PROFILES = {}
+DEFAULT_PROFILE = Profile(SHOW | INPUT)
+
+def register_profile(name, show=True, clear=False, input=True, grouped=False,
+                     modified=False, fill_color=None, **extra):
+    # Adds (or replaces) the defaults for State()s of the given display name.
+    flags = 0
+    for value, bit in ((show, SHOW), (clear, CLEAR), (input, INPUT),
+                       (grouped, GROUPED), (modified, MODIFIED)):
+        if value:
+            flags |= bit
+    PROFILES[name] = Profile(flags, fill_color, extra)
+
+# Main blacks out the screen before anything else gets displayed.
+register_profile(MAIN, modified=True, fill_color='black')
+# Control never shows. It only has a State() so it can override input.
+register_profile(CONTROL, show=False, modified=True, moving=False)
+register_profile(WORLD, clear=True, modified=True, fill_color='teal')
+# The Player() and every other entity, drawn over the World() as one group.
+register_profile(PLAYER, grouped=True)
+# The battle scene covers the World() and is only shown during a battle.
+register_profile(BATTLE, show=False, grouped=True, fill_color='black')
+# Text sits on top of the World(), so it must never wipe it away.
+register_profile(TEXT, grouped=True)
+register_profile(EMPTY, show=False, input=False, modified=True)
+# The frame profiler overlay sits on top of everything and never takes input.
+register_profile(PROFILER, input=False)
+
+
+# -------------------------------------- --------------------------------------
+def flag(name, bit):
+    # Builds the property for one packed flag. Setting it to a new value tells
+    # every observer about the change.
+    def get(self):
+        return bool(self._flags & bit)
+
+    def set(self, value):
+        if value:
+            flags = self._flags | bit
+        else:
+            flags = self._flags & ~bit
+        if flags != self._flags:
+            self._flags = flags
+            if self.observers:
+                for callback in self.observers:
+                    callback(self, name, bool(value))
+
+    return property(get, set)
+
 
 # -------------------------------------- --------------------------------------
 class State(object):
     # The State() object for displays. This tells the main display when to show individual
-    # displays based on the 'show', 'clear', and 'input' booleans.    
+    # displays based on the 'show', 'clear', and 'input' booleans.
+    #
+    # _____Notable things_____
+    # - The booleans are packed into _flags. Reading one is a property lookup.
+    #
+    # - subscribe(callback) gets callback(state, name, value) called every time a
+    #    flag actually changes, so nobody needs to poll for changes.
+    #
+    # - colors is COLORS itself, shared by every State().
+    __slots__ = (
+        'name', 'parent', '_flags', 'observers',
+        'fill_color', 'current', 'moving'
+        )
+
+    colors = COLORS
+
+    show     = flag('show', SHOW)
+    clear    = flag('clear', CLEAR)
+    input    = flag('input', INPUT)
+    grouped  = flag('grouped', GROUPED)
+    modified = flag('modified', MODIFIED)
+
     def __init__(self, name, parent):
         self.name = name
         self.parent = parent
-        self.show = True
-        self.clear = False
-        self.input = True
-        self.grouped = False
-        self.modified = False
+        self.observers = None
+        self.fill_color = None
+        self.current = None
         self.setup()
 
     def setup(self):
-        self.setup_colors()
-        
         # Set the proper states for each type of display State().
-        if self.name == MAIN:
-            self.deactivate(invert=True)
-            self.modified = True
-            self.grouped = False
-            self.fill_color = self.colors['black']
-
-        elif self.name == CONTROL:
-            self.deactivate(invert=False)
-            self.modified = True
-            self.moving = False
-            self.input = True
-            self.grouped = False
-            
-        elif self.name == WORLD:
-            self.deactivate(invert=True)
-            self.modified = True
-            self.grouped = False
-            self.fill_color = self.colors['teal']
-
-        elif self.name == PLAYER:
-            self.deactivate(invert=True)
-            self.modified = False
-            self.grouped = False
-
-        elif self.name == TEXT:
-            self.deactivate(invert=True)
-            self.modified = False
-            self.grouped = True
-
-        elif self.name == EMPTY:
-            self.deactivate(invert=False)
-            self.modified = True
-            self.grouped = False
-
-    def setup_colors(self):
-        try:
-            self.colors = self.parent.get_colors()
-        except AttributeError:
-            print("| E | setup_colors() failed. |")
+        profile = PROFILES.get(self.name, DEFAULT_PROFILE)
+        self._flags = profile.flags
+        if profile.fill_color:
+            self.fill_color = self.colors[profile.fill_color]
+        for attr in profile.extra:
+            setattr(self, attr, profile.extra[attr])
+
+    def subscribe(self, callback):
+        if self.observers is None:
+            self.observers = []
+        if callback not in self.observers:
+            self.observers.append(callback)
+
+    def unsubscribe(self, callback):
+        if self.observers and callback in self.observers:
+            self.observers.remove(callback)
 
     def deactivate(self, invert=False):
         self.show = invert
         self.input = invert
         self.clear = invert
-        
+
+
+# -------------------------------------- --------------------------------------
+class StateTable(dict):
+    # Display name -> State(). A State() is only made the first time its name is
+    # looked up.
+    def __init__(self, parent):
+        dict.__init__(self)
+        self.parent = parent
+
+    def __missing__(self, name):
+        state = State(name, self.parent)
+        self[name] = state
+        return state
+
+
+# -------------------------------------- --------------------------------------
+class InputPermission(object):
+    # Whether input is allowed, kept up to date as the input flags of registered
+    # State()s change. Input is allowed while at least one registered State() has
+    # input=True and none of the INPUT_OVERRIDES has input=False.
+    #
+    # _____Notable things_____
+    # - allowed is always current. Reading it is all it costs to check input.
+    def __init__(self):
+        self.enabled = 0
+        self.blocking = 0
+        self.allowed = False
+
+    def register(self, state):
+        if state.observers and self.changed in state.observers:
+            return
+        state.subscribe(self.changed)
+        self.count(state, state.input, 1)
+
+    def changed(self, state, name, value):
+        if name == 'input':
+            self.count(state, not value, -1)
+            self.count(state, value, 1)
+
+    def count(self, state, value, amount):
+        if value:
+            self.enabled += amount
+        elif state.name in INPUT_OVERRIDES:
+            self.blocking += amount
+        self.allowed = self.enabled >= 1 and not self.blocking
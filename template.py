@@ -3,15 +3,75 @@ template.py
 """
 
 # -------------------------------------- --------------------------------------
-# System imports
-import math
+# 3rd party imports
+import pygame
 
 
 # -------------------------------------- --------------------------------------
 class Template(object):
     """
     """
+    # - cache
+    #    the pre-rendered surface Display() blits for this display. render() only
+    #    runs again after invalidate(), so unchanged displays cost one blit.
+    #
+    # - opaque
+    #    True if this display paints every pixel of the screen. Display() skips
+    #    drawing anything underneath an opaque display.
     def __init__(self, key, state, name):
         self.key = key
         self.state = state
         self.name = name
+        self.dirty_rects = []
+        self.opaque = False
+        self.cache = None
+        self.cache_valid = False
+
+    def invalidate(self, rect=None):
+        # Tells Display() that this display changed and needs to be repainted. A rect
+        # (anything pygame.Rect() accepts) limits the repaint to that area; with no
+        # rect the whole screen is repainted.
+        self.dirty_rects.append(rect)
+        self.cache_valid = False
+
+    def get_dirty_rects(self):
+        # Display() calls this once per frame to collect what changed since the last
+        # frame. Handing the list over also resets it.
+        rects = self.dirty_rects
+        self.dirty_rects = []
+        return rects
+
+    def get_surface(self, size):
+        # Returns the cached surface, rebuilding it only if it was invalidated.
+        if self.cache is None or self.cache.get_size() != size:
+            if self.opaque:
+                self.cache = pygame.Surface(size)
+            else:
+                self.cache = pygame.Surface(size, pygame.SRCALPHA)
+            self.cache_valid = False
+
+        if not self.cache_valid:
+            self.render(self.cache)
+            self.cache_valid = True
+
+        return self.cache
+
+    def render(self, surface):
+        # Draws this display onto its cache surface. Displays that use the cache
+        # override this.
+        pass
+
+    def prepare(self):
+        # Does the next bit of getting ready to be shown, see Display().prewarm().
+        # Returns True while there is more to do.
+        return False
+
+    def pick(self, pos):
+        # Whatever part of this display is at pos (render surface coordinates), or
+        # None. Displays that can be clicked override this.
+        return None
+
+    def animating(self):
+        # True while this display changes on its own, without any input. Control()
+        # only lets the loop go idle when no display is animating.
+        return False
@@ -0,0 +1,138 @@
+"""
+text.py
+"""
+
+# -------------------------------------- --------------------------------------
+# 3rd party imports
+import pygame
+
+# Component imports
+import cache as CACHE
+import group as GROUP
+
+# Every atlas ever built, by (font name, size, color). Built on first use.
+ATLASES = {}
+
+# Rendered strings, shared by every Text() display.
+STRINGS = CACHE.SurfaceCache(2 * 1024 * 1024)
+
+
+# -------------------------------------- --------------------------------------
+def get_atlas(size, color, name=None):
+    key = (name, size, tuple(color))
+    if key not in ATLASES:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        ATLASES[key] = GlyphAtlas(pygame.font.Font(name, size), color)
+    return ATLASES[key]
+
+
+# -------------------------------------- --------------------------------------
+class GlyphAtlas(object):
+    # Every printable ASCII glyph of one font/size/color, rendered once into a
+    # single surface. Strings are put together from blits out of the atlas, so
+    # Font.render() is never called per frame. Glyphs outside the atlas are
+    # rendered the first time they show up and kept.
+    #
+    # Glyphs are placed side by side at their own advance, so there is no kerning.
+    # That's fine for HUD labels and numbers.
+    CHARACTERS = ''.join(chr(x) for x in range(32, 127))
+
+    def __init__(self, font, color):
+        self.font = font
+        self.color = color
+        self.height = font.get_height()
+        self.glyphs = {}
+        self.extra = {}
+
+        surfs = [font.render(char, True, color) for char in self.CHARACTERS]
+        width = sum(surf.get_width() for surf in surfs)
+        self.surface = pygame.Surface((max(width, 1), self.height), pygame.SRCALPHA)
+
+        x = 0
+        for char, surf in zip(self.CHARACTERS, surfs):
+            self.surface.blit(surf, (x, 0))
+            self.glyphs[char] = pygame.Rect(x, 0, surf.get_width(), self.height)
+            x += surf.get_width()
+
+    def size(self, text):
+        width = 0
+        for char in text:
+            if char in self.glyphs:
+                width += self.glyphs[char].width
+            else:
+                width += self.get_extra(char).get_width()
+        return width, self.height
+
+    def get_extra(self, char):
+        if char not in self.extra:
+            self.extra[char] = self.font.render(char, True, self.color)
+        return self.extra[char]
+
+    def compose(self, text):
+        # Builds the string's surface with one blits() call.
+        surface = pygame.Surface((max(self.size(text)[0], 1), self.height),
+                                 pygame.SRCALPHA)
+        blits = []
+        x = 0
+        for char in text:
+            if char in self.glyphs:
+                area = self.glyphs[char]
+                blits.append((self.surface, (x, 0), area))
+                x += area.width
+            else:
+                surf = self.get_extra(char)
+                blits.append((surf, (x, 0)))
+                x += surf.get_width()
+        surface.blits(blits, False)
+        return surface
+
+    def render(self, text):
+        # The surface for text, out of STRINGS if it was rendered before.
+        key = (id(self), text)
+        surface = STRINGS.get(key)
+        if surface is None:
+            surface = STRINGS.put(key, self.compose(text))
+        return surface
+
+
+# -------------------------------------- --------------------------------------
+class Label(GROUP.Item):
+    # One line of text inside a Text() display.
+    def __init__(self, atlas, text='', pos=(0, 0), layer=0):
+        self.atlas = atlas
+        self.text = text
+        GROUP.Item.__init__(self, atlas.render(text), pos, layer)
+
+    def set_text(self, text):
+        if text != self.text:
+            self.text = text
+            self.set_image(self.atlas.render(text))
+
+
+# -------------------------------------- --------------------------------------
+class Text(GROUP.Group):
+    # The 'text' display: a Group() of Label()s. send_msg() shows a line of text
+    # along the bottom of the screen, add_label() puts one anywhere else.
+    def __init__(self, key, state, text_type, number, size=(300, 300)):
+        GROUP.Group.__init__(self, key, state, 'text')
+        self.text_type = text_type
+        self.number = number
+        self.size = size
+        self.atlas = get_atlas(16, (240, 240, 240))
+        self.message = None
+
+    def add_label(self, text, pos, layer=0, atlas=None):
+        label = Label(atlas or self.atlas, text, pos, layer)
+        self.add(label)
+        return label
+
+    def send_msg(self, text):
+        text = str(text)
+        if self.message is None:
+            pos = (4, self.size[1] - self.atlas.height - 4)
+            self.message = self.add_label(text, pos)
+        else:
+            self.message.set_text(text)
+
+# -------------------------------------- --------------------------------------
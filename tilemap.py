@@ -0,0 +1,132 @@
+"""
+tilemap.py
+"""
+
+# -------------------------------------- --------------------------------------
+# System imports
+import collections
+import struct
+
+# 3rd party imports
+import numpy
+import pygame
+
+# Map files start with this header: magic, width and height in tiles, chunk size
+# in tiles. Tile ids (one byte each) follow chunk by chunk, so everything one
+# chunk needs sits in one contiguous run of the file.
+HEADER = struct.Struct('<4sIII')
+MAGIC = b'DLTM'
+
+# Tile id -> color. Ids past the end wrap around.
+PALETTE = numpy.array([
+    ( 60, 140,  60),    # grass
+    ( 40, 110,  50),    # tall grass
+    ( 30,  90, 170),    # water
+    (200, 190, 120),    # sand
+    (120, 120, 120),    # rock
+    ( 90,  70,  40)     # dirt
+    ], dtype=numpy.uint8)
+
+
+# -------------------------------------- --------------------------------------
+def create(path, width, height, chunk=16, seed=None):
+    # Writes a map file of width x height tiles filled with random terrain, one
+    # chunk at a time so even huge maps never have to fit in memory.
+    chunks_x = -(-width // chunk)
+    chunks_y = -(-height // chunk)
+    with open(path, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, width, height, chunk))
+        out.truncate(HEADER.size + chunks_x * chunks_y * chunk * chunk)
+
+    tiles = numpy.memmap(path, numpy.uint8, 'r+', HEADER.size,
+                         (chunks_y, chunks_x, chunk, chunk))
+    rng = numpy.random.default_rng(seed)
+    for cy in range(chunks_y):
+        tiles[cy] = rng.integers(0, len(PALETTE), (chunks_x, chunk, chunk))
+    tiles.flush()
+    del tiles
+
+
+# -------------------------------------- --------------------------------------
+class TileMap(object):
+    # A big tile map read straight off disk through a memory map. Only chunks near
+    # the camera are ever read and rendered, so opening a map costs the same no
+    # matter how large it is.
+    #
+    # _____Notable things_____
+    # - surfaces is an LRU of rendered chunk surfaces, (cx, cy) -> Surface.
+    #
+    # - update(view) renders what's missing around the view, at most prerender
+    #    chunks per call beyond the ones actually on screen, and forgets the ones
+    #    that have drifted out of reach.
+    def __init__(self, path, tile_size=16, margin=1, prerender=2, max_chunks=128,
+                 palette=PALETTE):
+        with open(path, 'rb') as source:
+            magic, width, height, chunk = HEADER.unpack(source.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("%s is not a map file" % path)
+
+        self.width = width
+        self.height = height
+        self.chunk = chunk
+        self.chunks_x = -(-width // chunk)
+        self.chunks_y = -(-height // chunk)
+        self.tiles = numpy.memmap(path, numpy.uint8, 'r', HEADER.size,
+                                  (self.chunks_y, self.chunks_x, chunk, chunk))
+
+        self.tile_size = tile_size
+        self.chunk_pixels = chunk * tile_size
+        self.size = (width * tile_size, height * tile_size)
+        self.palette = palette
+        self.margin = margin
+        self.prerender = prerender
+        self.max_chunks = max_chunks
+        self.surfaces = collections.OrderedDict()
+
+    def chunks_in(self, rect, margin=0):
+        # Every (cx, cy) that overlaps rect, plus margin chunks all around.
+        size = self.chunk_pixels
+        left = max(rect.left // size - margin, 0)
+        top = max(rect.top // size - margin, 0)
+        right = min((rect.right - 1) // size + margin, self.chunks_x - 1)
+        bottom = min((rect.bottom - 1) // size + margin, self.chunks_y - 1)
+        return [(cx, cy) for cy in range(top, bottom + 1)
+                for cx in range(left, right + 1)]
+
+    def render_chunk(self, cx, cy):
+        # One pixel per tile through the palette, then scaled up in one go.
+        colors = self.palette[self.tiles[cy, cx] % len(self.palette)]
+        small = pygame.surfarray.make_surface(colors.transpose(1, 0, 2))
+        return pygame.transform.scale(small, (self.chunk_pixels, self.chunk_pixels))
+
+    def get_chunk(self, key):
+        surface = self.surfaces.pop(key, None)
+        if surface is None:
+            surface = self.render_chunk(*key)
+        self.surfaces[key] = surface
+        return surface
+
+    def update(self, view):
+        budget = self.prerender
+        for key in self.chunks_in(view, self.margin):
+            if key not in self.surfaces and budget:
+                self.surfaces[key] = self.render_chunk(*key)
+                budget -= 1
+
+        keep = set(self.chunks_in(view, self.margin + 1))
+        for key in list(self.surfaces):
+            if key not in keep:
+                del self.surfaces[key]
+        while len(self.surfaces) > self.max_chunks:
+            self.surfaces.popitem(last=False)
+
+    def draw(self, surface, view):
+        # Blits only the chunks that intersect view (in map pixels) onto surface.
+        size = self.chunk_pixels
+        blits = []
+        for key in self.chunks_in(view):
+            pos = (key[0] * size - view.left, key[1] * size - view.top)
+            blits.append((self.get_chunk(key), pos))
+        surface.blits(blits, False)
+
+# -------------------------------------- --------------------------------------
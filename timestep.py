@@ -0,0 +1,40 @@
+"""
+timestep.py
+"""
+
+
+# -------------------------------------- --------------------------------------
+class FixedStep(object):
+    # Hands out real elapsed time in fixed sized simulation ticks so the game runs
+    # at the same speed no matter how fast frames are rendered.
+    #
+    # _____Notable things_____
+    # - accumulator
+    #    milliseconds of real time that have not been simulated yet.
+    #
+    # - max_ticks
+    #    the lag limit. A frame never runs more ticks than this; anything past it
+    #    is thrown away instead of snowballing into an ever longer catch up.
+    def __init__(self, tick_rate=30, max_ticks=5):
+        self.tick_rate = tick_rate
+        self.step = 1000.0 / tick_rate
+        self.max_ticks = max_ticks
+        self.accumulator = 0.0
+        self.ticks = 0
+
+    def advance(self, elapsed):
+        # Adds elapsed milliseconds and returns how many ticks should run now.
+        self.accumulator += elapsed
+        ticks = int(self.accumulator // self.step)
+        self.accumulator -= ticks * self.step
+
+        if ticks > self.max_ticks:
+            ticks = self.max_ticks
+
+        self.ticks += ticks
+        return ticks
+
+    def reset(self):
+        self.accumulator = 0.0
+
+# -------------------------------------- --------------------------------------
@@ -1,14 +1,64 @@
+# 3rd party imports
+import pygame
 
+# Component imports
+import template as TEMPLATE
 
-class World(object):
 
+class World(TEMPLATE.Template):
+    # Where the Player() walks around. Without a map it is just the fill color;
+    # with one it is a TileMap() seen through camera, a window-sized rect in map
+    # pixels that follows the Player(). A background (the keyword arguments for
+    # Background(), see background.py) replaces the plain fill when there is no map.
 
-    def __init__(self, key, state):
-        self.key = key
-        self.state = state
+    def __init__(self, key, state, camera, map_path=None, background=None):
+        TEMPLATE.Template.__init__(self, key, state, 'world')
+        self.opaque = True
+        self.camera = camera
+        self.map = None
+        self.size = camera.size
+        if map_path:
+            import tilemap as TILEMAP
+            self.map = TILEMAP.TileMap(map_path)
+            self.size = self.map.size
+        self.background = None
+        if background and not self.map:
+            import background as BACKGROUND
+            self.background = BACKGROUND.Background(camera.size, **background)
 
     def update(self):
-        pass
+        if self.map:
+            self.map.update(self.camera)
+        elif self.background and self.background.step():
+            self.invalidate()
+
+    def animating(self):
+        return bool(self.background and self.background.animated)
+
+    def follow(self, pos):
+        # Centers the camera on pos without showing anything past the map edges.
+        if not self.map:
+            return
+        old = self.camera.topleft
+        self.camera.center = (int(pos[0]), int(pos[1]))
+        self.camera.clamp_ip(pygame.Rect((0, 0), self.size))
+        if self.camera.topleft != old:
+            self.invalidate()
+
+    def draw(self, surface):
+        # The map is drawn straight from its chunk surfaces, anything else from the
+        # cached fill. The fill only shows around a map smaller than the camera.
+        if self.map:
+            if self.size[0] < self.camera.width or self.size[1] < self.camera.height:
+                surface.fill(self.state.fill_color)
+            self.map.draw(surface, self.camera)
+        elif self.background:
+            self.background.draw(surface)
+        else:
+            surface.blit(self.get_surface(self.camera.size), (0, 0))
+
+    def render(self, surface):
+        surface.fill(self.state.fill_color)
 
     def deactivate(self, invert=False):
         self.show = invert
@@ -16,20 +66,8 @@ class World(object):
         self.input = invert
 
     def change_color(self, rgb, change):
-        old = self.state.fill_color
-        current = old[rgb]
-        if current + change > 255:
-            output = 255
-        elif current + change < 0:
-            output = 0
-        else:
-            output = (current + change)
-            
-        if rgb == 0:
-            clist = [output, old[rgb+1], old[rgb+2]]
-        elif rgb == 1:
-            clist = [old[rgb-1], output, old[rgb+1]]
-        else:
-            clist = [old[rgb-2], old[rgb-1], output]
-
-        self.state.fill_color = clist
+        # Moves one channel of the fill color by change, kept within 0-255.
+        color = list(self.state.fill_color[:3])
+        color[rgb] = max(0, min(255, color[rgb] + change))
+        self.state.fill_color = tuple(color)
+        self.invalidate()